@@ -0,0 +1,57 @@
+"""TextProcessor mikro benchmark'ı: önceki NLTK yolu ile derlenmiş regex yolu
+
+Kullanım (proje kökünden):
+    python -m benchmarks.text_processor_bench [tekrar_sayısı]
+"""
+import re
+import sys
+import time
+from nltk.tokenize import word_tokenize
+from data.curriculum_loader import CurriculumLoader
+from utils.text_processor import TextProcessor
+
+def legacy_clean_text(text: str) -> str:
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'[^\w\s]', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+def legacy_extract_keywords(text: str, stop_words, top_k: int = 10):
+    tokens = word_tokenize(text.lower(), language='turkish')
+    tokens = [token for token in tokens if token not in stop_words and len(token) > 2]
+    word_freq = {}
+    for token in tokens:
+        word_freq[token] = word_freq.get(token, 0) + 1
+    sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
+    return [word for word, freq in sorted_words[:top_k]]
+
+def _measure(label: str, func, texts, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(texts)
+    elapsed = time.perf_counter() - start
+    per_doc_us = elapsed / (rounds * len(texts)) * 1e6
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms  ({per_doc_us:7.1f} µs/doküman)")
+    return elapsed
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    processor = TextProcessor()
+    texts = [doc['content'] for doc in CurriculumLoader(processor)._raw_din_kulturu_curriculum()]
+    
+    def legacy(batch):
+        for text in batch:
+            legacy_extract_keywords(legacy_clean_text(text), processor.stop_words)
+    
+    def current(batch):
+        for text in batch:
+            processor.clean_and_extract(text)
+    
+    print(f"{len(texts)} doküman x {rounds} tekrar")
+    legacy_time = _measure("NLTK (önceki yol)", legacy, texts, rounds)
+    current_time = _measure("Derlenmiş regex", current, texts, rounds)
+    _measure("Derlenmiş regex (toplu)", processor.clean_and_extract_many, texts, rounds)
+    print(f"Hızlanma: {legacy_time / current_time:.1f}x")
+
+if __name__ == "__main__":
+    main()
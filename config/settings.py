@@ -8,19 +8,83 @@ class Settings(BaseSettings):
     
     # Model Settings
     EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_DIMENSION: int = 384  # EMBEDDING_MODEL'in çıktı boyutu; snapshot bununla doğrulanır
     GEMINI_MODEL: str = "gemini-2.0-flash-exp"
     
     # Cache Settings
     REDIS_URL: str = "redis://localhost:6379"
     CACHE_TTL: int = 3600  # 1 hour
+    L1_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # 32 MB süreç içi cache
+    L1_CACHE_TTL: int = 300  # 5 minutes
+    CACHE_COMPRESSION: str = "zlib"  # none | zlib | zstd
+    CACHE_COMPRESSION_MIN_BYTES: int = 1024
+    EMBEDDING_CACHE_DTYPE: str = "float32"  # float16 ile yarı bellek
+    REDIS_MAX_CONNECTIONS: int = 64  # Süreç başına paylaşılan havuz
+    REDIS_POOL_TIMEOUT: float = 1.0  # Havuz doluyken boş bağlantı bekleme süresi
+    REDIS_SOCKET_TIMEOUT: float = 0.5
+    REDIS_CONNECT_TIMEOUT: float = 0.5
+    REDIS_BREAKER_FAILURES: int = 5  # Art arda bu kadar bağlantı hatasında cache atlanır
+    REDIS_BREAKER_RESET: float = 30.0  # Devre açıkken yeniden deneme aralığı (saniye)
+    CACHE_GENERATION_REFRESH: float = 5.0  # Prefix nesillerinin Redis'ten yeniden okunma aralığı
+    CACHE_CLEAR_SCAN_COUNT: int = 1000  # SCAN adımı başına istenen anahtar sayısı
+    CACHE_CLEAR_BATCH_SIZE: int = 500  # Tek UNLINK çağrısındaki anahtar sayısı
+    CACHE_CLEAR_MAX_JOBS: int = 20  # Durumu saklanan son temizleme işi sayısı
+    
+    # Semantic Cache Settings
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92  # Kosinüs benzerliği eşiği
+    SEMANTIC_CACHE_MIN_SOURCE_OVERLAP: float = 0.6  # Bağlam dokümanları Jaccard eşiği
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 2000
+    SEMANTIC_CACHE_REFRESH: int = 30  # İndeksin Redis'ten yenilenme aralığı (saniye)
     
     # RAG Settings
+    RETRIEVAL_BACKEND: str = "chroma"  # chroma | local (süreç içi numpy indeksi)
     CHROMA_DB_PATH: str = "./chroma_db"
+    LOCAL_INDEX_PATH: str = "./local_index"
+    EMBEDDING_SNAPSHOT_PATH: str = "./embedding_snapshot"  # `python main.py build-snapshot` ile üretilir
     TOP_K_DOCUMENTS: int = 5
+    SEARCH_BATCH_MAX_QUERIES: int = 1000  # /curriculum/search/batch istek başına sorgu sınırı
+    SEARCH_MAX_RESULTS: int = 50  # Sorgu başına istenebilecek en fazla sonuç
+    HYBRID_RETRIEVAL: bool = True  # yoğun + BM25 sonuçlarını RRF ile birleştir
+    HYBRID_CANDIDATE_MULTIPLIER: int = 3
+    BM25_K1: float = 1.5
+    BM25_B: float = 0.75
+    RRF_K: int = 60
+    CONTEXT_MAX_CHARS: int = 3000  # Prompt'a giren bağlam bütçesi (0: dokümanlar bütün olarak)
+    CONTEXT_MMR_LAMBDA: float = 0.7  # 1: yalnızca ilgi, 0: yalnızca çeşitlilik
+    CONTEXT_DUPLICATE_THRESHOLD: float = 0.95
+    CONTEXT_SENTENCE_MAX_WORDS: int = 25
+    CHUNKING_ENABLED: bool = True  # Dokümanlar örtüşmeli parçalar halinde indekslenir
+    CHUNK_MAX_WORDS: int = 40
+    CHUNK_OVERLAP_WORDS: int = 10
     
     # RARE Settings
     REASONING_DEPTH: int = 3
+    REASONING_CONTEXT_STEP: int = 2  # Her derin seviyede bağlama eklenen doküman sayısı
     PREDICTION_CONFIDENCE_THRESHOLD: float = 0.7
+    TOPIC_CONCURRENCY: int = 4  # Aynı anda işlenen konu sayısı
+    TOPIC_TIMEOUT: float = 90.0  # Konu başına saniye; aşan konu tahminden çıkarılır
+    
+    # Single-flight Settings (eşzamanlı aynı tahmin isteklerini birleştirme)
+    SINGLE_FLIGHT_ENABLED: bool = True
+    SINGLE_FLIGHT_LEASE_TTL: float = 15.0  # Redis kira süresi (saniye); lider çalışırken yenilenir
+    SINGLE_FLIGHT_RESULT_TTL: int = 30  # Liderin sonucunu diğer worker'lara ilettiği anahtarın ömrü
+    SINGLE_FLIGHT_WAIT_TIMEOUT: float = 300.0  # Bu süreden sonra bekleyen istek kendisi hesaplar
+    SINGLE_FLIGHT_POLL_INTERVAL: float = 0.25
+    
+    # Prediction Freshness Settings
+    PREDICTION_STALE_WHILE_REVALIDATE: bool = True  # Gün dönümünde eski sonucu sun, arka planda yenile
+    PREDICTION_STALE_TTL: int = 3 * 24 * 3600  # Son bilinen sonucun saklanma süresi
+    PREWARM_ENABLED: bool = True
+    PREWARM_TIME: str = "23:15"  # Ertesi günün popüler tahminlerinin hesaplandığı saat (yerel)
+    PREWARM_TOP_N: int = 5
+    
+    # Concurrency Settings
+    WORKER_THREADS: int = 16  # Gemini, embedding, Redis ve Chroma çağrıları için
+    HEALTH_PROBE_TIMEOUT: float = 2.0  # Sağlık kontrolü bileşen başına süre sınırı (saniye)
+    TEXT_PROCESS_WORKERS: int = 0  # >1: büyük metin gruplarında süreç havuzu
+    TEXT_PROCESS_MIN_BATCH: int = 500
     
     class Config:
         env_file = ".env"
@@ -1,13 +1,71 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import json
+import copy
+import hashlib
+import threading
+from datetime import datetime
 from utils.text_processor import TextProcessor
 
-class CurriculumLoader:
-    def __init__(self):
-        self.text_processor = TextProcessor()
+class CurriculumSnapshot:
+    """İşlenmiş müfredatın bir kez kurulan, salt okunur görüntüsü
+    
+    Konu→alt konu indeksi, konu sayıları ve /curriculum/topics yanıtı önceden
+    hesaplanır. `version` kaynak verinin içerik özetidir ve ETag olarak kullanılır.
+    """
+    
+    def __init__(self, documents: List[Dict[str, Any]], version: str):
+        self.documents = tuple(documents)
+        self.version = version
+        self.etag = f'"{version}"'
+        self.built_at = datetime.now().isoformat()
         
+        topics = {}
+        for doc in self.documents:
+            topics.setdefault(doc['topic'], []).append({
+                'subtopic': doc['subtopic'],
+                'difficulty': doc['difficulty'],
+                'keywords': doc.get('keywords', [])
+            })
+        self.topic_index = topics
+        self.topic_counts = {topic: len(subtopics) for topic, subtopics in topics.items()}
+        self.topics_payload = {
+            "topics": topics,
+            "total_topics": len(topics),
+            "total_subtopics": len(self.documents)
+        }
+
+class CurriculumLoader:
+    def __init__(self, text_processor: TextProcessor = None):
+        self.text_processor = text_processor or TextProcessor()
+        self._snapshot: Optional[CurriculumSnapshot] = None
+        self._snapshot_lock = threading.Lock()
+    
+    def get_snapshot(self) -> CurriculumSnapshot:
+        """Önbellekteki müfredat görüntüsünü döndür (ilk çağrıda kurulur)"""
+        if self._snapshot is None:
+            with self._snapshot_lock:
+                if self._snapshot is None:
+                    self._snapshot = self._build_snapshot(self._raw_din_kulturu_curriculum())
+        return self._snapshot
+    
+    def _build_snapshot(self, raw_documents: List[Dict[str, Any]], version: str = None) -> CurriculumSnapshot:
+        """Ham müfredattan görüntü oluştur"""
+        return CurriculumSnapshot(
+            self._process_documents(copy.deepcopy(raw_documents)),
+            version or self._source_version(raw_documents)
+        )
+    
+    def _source_version(self, raw_documents: List[Dict[str, Any]]) -> str:
+        """Kaynak verinin içerik özeti"""
+        data_str = json.dumps(raw_documents, sort_keys=True, ensure_ascii=False)
+        return hashlib.md5(data_str.encode('utf-8')).hexdigest()
+    
     def load_din_kulturu_curriculum(self) -> List[Dict[str, Any]]:
         """Din Kültürü müfredatını yükle"""
+        return self._process_documents(self._raw_din_kulturu_curriculum())
+    
+    def _raw_din_kulturu_curriculum(self) -> List[Dict[str, Any]]:
+        """İşlenmemiş Din Kültürü müfredat verisi"""
         
         # LGS Din Kültürü Müfredatı - Ana Konular
         curriculum_data = [
@@ -166,17 +224,18 @@ class CurriculumLoader:
             }
         ]
         
+        return curriculum_data
+    
+    def _process_documents(self, curriculum_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Dokümanları temizle ve anahtar kelimelerle zenginleştir"""
         # Her dokümana anahtar kelimeler ve işlenmiş metin ekle
+        # Temizleme ve otomatik anahtar kelime çıkarma tek toplu çağrıda
+        processed_texts = self.text_processor.clean_and_extract_many([doc['content'] for doc in curriculum_data])
+        
         processed_documents = []
-        for doc in curriculum_data:
+        for doc, (cleaned_text, auto_keywords) in zip(curriculum_data, processed_texts):
             processed_doc = doc.copy()
-            
-            # Metni temizle
-            cleaned_text = self.text_processor.clean_text(doc['content'])
             processed_doc['content'] = cleaned_text
-            
-            # Otomatik anahtar kelime çıkarma
-            auto_keywords = self.text_processor.extract_keywords(cleaned_text)
             processed_doc['auto_keywords'] = auto_keywords
             
             # Mevcut anahtar kelimelerle birleştir
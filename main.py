@@ -1,14 +1,16 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Iterator
+import asyncio
+import json
 import uvicorn
 from datetime import datetime
 
-from services.prediction_service import PredictionService
-from models.rare_model import RAREModel
-from data.curriculum_loader import CurriculumLoader
+from services.container import container
 from config.settings import settings
+from utils.concurrency import run_blocking, run_probe
 
 # FastAPI uygulaması
 app = FastAPI(
@@ -26,10 +28,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global servis instance'ları
-prediction_service = PredictionService()
-rare_model = RAREModel()
-curriculum_loader = CurriculumLoader()
+# Servis grafiği tek bir kapta paylaşılır; ağır bileşenler arka planda ısıtılır
+@app.on_event("startup")
+async def start_services():
+    container.start_background_warm_up()
+    if settings.PREWARM_ENABLED:
+        container.prewarm_scheduler.start()
+
+def _services():
+    """Hazır servis kabını döndür; ısınma sürüyorsa 503 ver"""
+    if not container.ready:
+        detail = container.startup_error or "Servisler hazırlanıyor"
+        raise HTTPException(status_code=503, detail=detail)
+    return container
 
 # Pydantic modelleri
 class PredictionRequest(BaseModel):
@@ -47,6 +58,30 @@ class QuestionGenerationRequest(BaseModel):
     count: int = 5
     difficulty: Optional[str] = None
 
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    topic: Optional[str] = None
+    n_results: Optional[int] = Field(default=None, ge=1, le=settings.SEARCH_MAX_RESULTS)
+    expand: bool = False
+
+def _ndjson_stream(events: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    """Olayları NDJSON satırları olarak gönder"""
+    try:
+        for event in events:
+            yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+    except Exception as e:
+        yield json.dumps({"event": "error", "data": {"detail": str(e)}}, ensure_ascii=False) + "\n"
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match başlığı verilen ETag ile eşleşiyor mu"""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(
+        candidate[2:] == etag if candidate.startswith("W/") else candidate == etag
+        for candidate in candidates
+    )
+
 # API Endpoints
 @app.get("/")
 async def root():
@@ -62,8 +97,9 @@ async def root():
 @app.post("/predict/exam-questions")
 async def predict_exam_questions(request: PredictionRequest):
     """Sınav soruları tahmin et"""
+    services = _services()
     try:
-        result = prediction_service.predict_next_exam_questions(
+        result = await services.prediction_service.predict_next_exam_questions_async(
             exam_date=request.exam_date,
             question_count=request.question_count,
             difficulty_filter=request.difficulty_filter,
@@ -73,11 +109,26 @@ async def predict_exam_questions(request: PredictionRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/predict/exam-questions/stream")
+async def predict_exam_questions_stream(request: PredictionRequest):
+    """Tahmin edilen soruları tamamlandıkça NDJSON olarak akıt"""
+    services = _services()
+    return StreamingResponse(
+        _ndjson_stream(services.prediction_service.stream_next_exam_questions(
+            exam_date=request.exam_date,
+            question_count=request.question_count,
+            difficulty_filter=request.difficulty_filter,
+            topic_filter=request.topic_filter
+        )),
+        media_type="application/x-ndjson"
+    )
+
 @app.post("/analyze/topic")
 async def analyze_topic(request: TopicAnalysisRequest):
     """Belirli bir konuyu detaylı analiz et"""
+    services = _services()
     try:
-        result = prediction_service.get_topic_specific_prediction(
+        result = await services.prediction_service.get_topic_specific_prediction_async(
             topic=request.topic,
             depth=request.depth
         )
@@ -88,12 +139,14 @@ async def analyze_topic(request: TopicAnalysisRequest):
 @app.post("/generate/questions")
 async def generate_questions(request: QuestionGenerationRequest):
     """Belirli bir konu için soru üret"""
+    services = _services()
     try:
-        context = rare_model.rag_system.get_context_for_query(request.topic, request.topic)
-        result = rare_model.gemini_service.generate_questions_with_reasoning(
-            context=context,
+        context_bundle = await services.rare_model.rag_system.get_context_bundle_async(request.topic, request.topic)
+        result = await services.rare_model.gemini_service.generate_questions_with_reasoning_async(
+            context=context_bundle['context'],
             topic=request.topic,
-            count=request.count
+            count=request.count,
+            source_ids=context_bundle['source_ids']
         )
         
         # Zorluk filtresi uygula
@@ -108,38 +161,50 @@ async def generate_questions(request: QuestionGenerationRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/generate/questions/stream")
+async def generate_questions_stream(request: QuestionGenerationRequest):
+    """Üretilen soruları tamamlandıkça NDJSON olarak akıt"""
+    services = _services()
+    def events():
+        context_bundle = services.rare_model.rag_system.get_context_bundle(request.topic, request.topic)
+        emitted = 0
+        for question in services.rare_model.gemini_service.stream_questions_with_reasoning(
+            context_bundle['context'], request.topic, request.count,
+            source_ids=context_bundle['source_ids']
+        ):
+            # Zorluk filtresi uygula
+            if request.difficulty and question.get('difficulty') != request.difficulty:
+                continue
+            emitted += 1
+            yield {"event": "question", "data": question}
+        yield {"event": "done", "data": {"total_questions": emitted}}
+    
+    return StreamingResponse(_ndjson_stream(events()), media_type="application/x-ndjson")
+
 @app.get("/curriculum/topics")
-async def get_curriculum_topics():
-    """Müfredat konularını listele"""
+async def get_curriculum_topics(request: Request):
+    """Müfredat konularını listele (modele ihtiyaç duymaz; ısınma sürerken de yanıt verir)"""
     try:
-        curriculum_data = curriculum_loader.load_din_kulturu_curriculum()
-        topics = {}
-        
-        for doc in curriculum_data:
-            topic = doc['topic']
-            if topic not in topics:
-                topics[topic] = []
-            topics[topic].append({
-                'subtopic': doc['subtopic'],
-                'difficulty': doc['difficulty'],
-                'keywords': doc.get('keywords', [])
-            })
+        snapshot = container.curriculum_loader.get_snapshot()
+        headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
         
-        return {
-            "topics": topics,
-            "total_topics": len(topics),
-            "total_subtopics": len(curriculum_data)
-        }
+        # İstemcideki sürüm güncelse gövdesiz 304 dön
+        if _etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+            return Response(status_code=304, headers=headers)
+        
+        return JSONResponse(snapshot.topics_payload, headers=headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/curriculum/search")
-async def search_curriculum(query: str, topic: Optional[str] = None):
-    """Müfredat içinde arama yap"""
+async def search_curriculum(query: str, topic: Optional[str] = None, expand: bool = False):
+    """Müfredat içinde arama yap (expand=true: eşleşen parçaların üst dokümanları)"""
+    services = _services()
     try:
-        relevant_docs = rare_model.rag_system.search_relevant_documents(
+        relevant_docs = await services.rare_model.rag_system.search_relevant_documents_async(
             query=query,
-            filters={'topic': topic} if topic else None
+            filters={'topic': topic} if topic else None,
+            expand_to_parent=expand
         )
         
         return {
@@ -151,11 +216,40 @@ async def search_curriculum(query: str, topic: Optional[str] = None):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/curriculum/search/batch")
+async def search_curriculum_batch(request: BatchSearchRequest):
+    """Birden fazla sorguyu tek seferde ara (toplu embedding, tek vektör sorgusu)"""
+    services = _services()
+    if len(request.queries) > settings.SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"En fazla {settings.SEARCH_BATCH_MAX_QUERIES} sorgu gönderilebilir"
+        )
+    try:
+        grouped_docs = await services.rare_model.rag_system.search_many_async(
+            request.queries,
+            filters={'topic': request.topic} if request.topic else None,
+            n_results=request.n_results,
+            expand_to_parent=request.expand
+        )
+        
+        return {
+            "topic_filter": request.topic,
+            "results": [
+                {"query": query, "results": docs, "result_count": len(docs)}
+                for query, docs in zip(request.queries, grouped_docs)
+            ],
+            "query_count": len(request.queries)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/analysis/curriculum-trends")
 async def analyze_curriculum_trends():
     """Müfredat trendlerini analiz et"""
+    services = _services()
     try:
-        analysis = rare_model.analyze_curriculum_trends()
+        analysis = await services.rare_model.analyze_curriculum_trends_async()
         return analysis
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -163,86 +257,158 @@ async def analyze_curriculum_trends():
 @app.post("/reasoning/deep-analysis")
 async def deep_reasoning_analysis(topic: str, depth: int = 3):
     """Derin reasoning analizi yap"""
+    services = _services()
     try:
-        result = rare_model.deep_reasoning(topic, depth)
+        result = await services.rare_model.deep_reasoning_async(topic, depth)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.delete("/cache/clear")
+@app.post("/reasoning/deep-analysis/stream")
+async def deep_reasoning_analysis_stream(topic: str, depth: int = 3):
+    """Derin reasoning analizini seviye seviye NDJSON olarak akıt"""
+    services = _services()
+    # Senkron generator Starlette tarafından thread havuzunda tüketilir
+    return StreamingResponse(
+        _ndjson_stream(services.rare_model.iter_deep_reasoning(topic, depth)),
+        media_type="application/x-ndjson"
+    )
+
+@app.delete("/cache/clear", status_code=202)
 async def clear_cache(pattern: str = "*"):
-    """Cache'i temizle"""
+    """Desene uyan cache anahtarlarını arka planda SCAN/UNLINK ile temizle"""
+    services = _services()
+    try:
+        job = services.cache_clear_jobs.start(pattern)
+        return {"message": f"Cache clear started with pattern: {pattern}", "job": job}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/cache/clear/{job_id}")
+async def clear_cache_status(job_id: str):
+    """Cache temizleme işinin ilerlemesi (taranan/silinen anahtar sayısı)"""
+    job = _services().cache_clear_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Temizleme işi bulunamadı")
+    return job
+
+@app.post("/cache/invalidate/{prefix}")
+async def invalidate_cache_namespace(prefix: str):
+    """Prefix'in (ör. prediction_service) tüm kayıtlarını nesil sayacıyla O(1) geçersizleştir"""
+    services = _services()
     try:
-        rare_model.cache.clear_cache(pattern)
-        return {"message": f"Cache cleared with pattern: {pattern}"}
+        generation = await run_blocking(services.cache.invalidate_namespace, prefix)
+        return {"prefix": prefix, "generation": generation}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/cache/prewarm")
+async def prewarm_predictions(for_date: Optional[str] = None, limit: Optional[int] = None):
+    """Popüler tahminleri verilen gün (varsayılan: yarın) için önceden hesapla"""
+    services = _services()
+    try:
+        return await run_blocking(services.prediction_service.prewarm_popular, for_date, limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/system/health")
 async def health_check():
-    """Sistem sağlık kontrolü"""
+    """Sistem sağlık kontrolü (ısınma sürerken de hemen yanıt verir)"""
     try:
-        # Redis bağlantısı kontrol et
+        if not container.ready:
+            return {
+                "status": "error" if container.startup_error else "starting",
+                "ready": False,
+                "timestamp": datetime.now().isoformat(),
+                "detail": container.startup_error,
+                "components": {
+                    "embedding_model": "loading",
+                    "gemini_api": "healthy" if settings.GOOGLE_API_KEY else "not_configured"
+                }
+            }
+        
+        # Redis bağlantısı kontrol et (async istemci: paylaşılan thread havuzunu beklemez)
         redis_status = "healthy"
         try:
-            rare_model.cache.redis_client.ping()
+            await asyncio.wait_for(container.cache.async_client.ping(), settings.HEALTH_PROBE_TIMEOUT)
         except:
             redis_status = "error"
         
-        # ChromaDB kontrol et
-        chroma_status = "healthy"
+        # Retrieval arka ucunu kontrol et (ayrı küçük havuzda)
+        store_status = "healthy"
         try:
-            rare_model.rag_system.collection.count()
+            await run_probe(container.rag_system.document_count)
         except:
-            chroma_status = "error"
+            store_status = "error"
         
         return {
             "status": "healthy",
+            "ready": True,
             "timestamp": datetime.now().isoformat(),
             "components": {
                 "redis_cache": redis_status,
-                "chroma_db": chroma_status,
+                "vector_store": store_status,
+                "embedding_model": "loaded" if container.embedding_generator.is_loaded else "not_loaded",
                 "gemini_api": "healthy" if settings.GOOGLE_API_KEY else "not_configured"
             }
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/system/ready")
+async def readiness_check():
+    """Hazırlık kontrolü: model ısınana kadar 503 döner"""
+    _services()
+    return {"ready": True, "timestamp": datetime.now().isoformat()}
+
 @app.get("/system/stats")
 async def system_stats():
     """Sistem istatistikleri"""
+    services = _services()
     try:
         # ChromaDB doküman sayısı
-        doc_count = rare_model.rag_system.collection.count()
+        doc_count = await run_blocking(services.rare_model.rag_system.document_count)
         
         # Müfredat konuları
-        curriculum_data = curriculum_loader.load_din_kulturu_curriculum()
-        topic_counts = {}
-        for doc in curriculum_data:
-            topic = doc['topic']
-            topic_counts[topic] = topic_counts.get(topic, 0) + 1
+        snapshot = services.curriculum_loader.get_snapshot()
         
         return {
             "database_stats": {
                 "total_documents": doc_count,
-                "curriculum_topics": len(topic_counts),
-                "topic_distribution": topic_counts
+                "curriculum_topics": len(snapshot.topic_counts),
+                "topic_distribution": snapshot.topic_counts,
+                "curriculum_version": snapshot.version
             },
             "system_config": {
                 "embedding_model": settings.EMBEDDING_MODEL,
                 "gemini_model": settings.GEMINI_MODEL,
                 "cache_ttl": settings.CACHE_TTL,
-                "top_k_documents": settings.TOP_K_DOCUMENTS
+                "top_k_documents": settings.TOP_K_DOCUMENTS,
+                "retrieval_backend": settings.RETRIEVAL_BACKEND
+            },
+            "cache_stats": {
+                **services.rare_model.cache.get_stats(),
+                "semantic": services.rare_model.semantic_cache.stats(),
+                "single_flight": services.prediction_service.single_flight.stats()
             }
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Cache ölçümleri (Prometheus metin biçimi); ısınma sürerken de yanıt verir"""
+    return Response(
+        content=container.cache.render_metrics(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 # CLI Fonksiyonları
 class CLIInterface:
     def __init__(self):
-        self.prediction_service = PredictionService()
-        self.rare_model = RAREModel()
+        container.warm_up()
+        self.prediction_service = container.prediction_service
+        self.rare_model = container.rare_model
     
     def interactive_prediction(self):
         """Etkileşimli tahmin modu"""
@@ -377,7 +543,8 @@ class CLIInterface:
             print(f"\n{i}. Konu: {doc['metadata'].get('topic', 'Bilinmeyen')}")
             print(f"   Alt Konu: {doc['metadata'].get('subtopic', 'Bilinmeyen')}")
             print(f"   İçerik: {doc['content'][:150]}...")
-            print(f"   Benzerlik: {1 - doc['distance']:.3f}")
+            if doc['distance'] is not None:
+                print(f"   Benzerlik: {1 - doc['distance']:.3f}")
 
 if __name__ == "__main__":
     import sys
@@ -386,6 +553,16 @@ if __name__ == "__main__":
         # CLI modu
         cli = CLIInterface()
         cli.interactive_prediction()
+    elif len(sys.argv) > 1 and sys.argv[1] == "build-snapshot":
+        # Müfredat embedding'lerini çevrimdışı üret
+        from models.embedding_snapshot import build_embedding_snapshot
+        snapshot_path = sys.argv[2] if len(sys.argv) > 2 else settings.EMBEDDING_SNAPSHOT_PATH
+        manifest = build_embedding_snapshot(
+            container.rag_system,
+            container.rag_system.chunk_documents(list(container.curriculum_loader.get_snapshot().documents)),
+            snapshot_path
+        )
+        print(f"✅ Embedding snapshot yazıldı: {snapshot_path} ({manifest['count']} doküman, {manifest['dim']} boyut)")
     else:
         # Web server modu
         print("🚀 LGS Din Kültürü Soru Tahmin Sistemi başlatılıyor...")
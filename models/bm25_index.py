@@ -0,0 +1,118 @@
+import math
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+class BM25Index:
+    """Süreç içi ters indeks üzerinde Okapi BM25 skorlayıcı
+    
+    Dokümanlar add() ile tek tek eklenir; terim -> {doküman: frekans} listeleri
+    ve doküman uzunlukları tutulur, IDF sorgu anında hesaplanır. Filtreler
+    vektör deposundaki gibi metadata eşitliği ile uygulanır.
+    """
+    
+    def __init__(self, tokenizer: Callable[[str], List[str]], k1: float = 1.5, b: float = 0.75):
+        self.tokenizer = tokenizer
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._postings = {}
+        self._doc_lengths = {}
+        self._doc_terms = {}
+        self._documents = {}
+        self._fingerprints = {}
+        self._total_length = 0
+    
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+    
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._doc_lengths
+    
+    def fingerprint(self, doc_id: str) -> Optional[str]:
+        """İndekslenmiş dokümanın metadata parmak izi"""
+        return self._fingerprints.get(doc_id)
+    
+    def add(self, doc_id: str, text: str, content: str, metadata: Dict[str, Any]):
+        """Dokümanı indeksle; aynı kimlik varsa önce çıkarılır"""
+        term_counts = Counter(self.tokenizer(text))
+        with self._lock:
+            self._remove_locked(doc_id)
+            for term, tf in term_counts.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+            self._doc_terms[doc_id] = list(term_counts)
+            length = sum(term_counts.values())
+            self._doc_lengths[doc_id] = length
+            self._total_length += length
+            self._documents[doc_id] = (content, metadata)
+            self._fingerprints[doc_id] = (metadata or {}).get('fingerprint')
+    
+    def remove(self, doc_ids: List[str]):
+        """Dokümanları indeksten çıkar"""
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove_locked(doc_id)
+    
+    def _remove_locked(self, doc_id: str):
+        if doc_id not in self._doc_lengths:
+            return
+        for term in self._doc_terms.pop(doc_id, []):
+            postings = self._postings.get(term, {})
+            postings.pop(doc_id, None)
+            if not postings:
+                self._postings.pop(term, None)
+        self._total_length -= self._doc_lengths.pop(doc_id)
+        self._documents.pop(doc_id, None)
+        self._fingerprints.pop(doc_id, None)
+    
+    def search(self, query: str, top_k: int,
+               where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Sorguya en yüksek BM25 skoruna sahip dokümanları döndür"""
+        terms = set(self.tokenizer(query))
+        if not terms or not self._doc_lengths:
+            return []
+        
+        with self._lock:
+            doc_count = len(self._doc_lengths)
+            avg_length = self._total_length / doc_count or 1.0
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    if where and not self._matches(doc_id, where):
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            return [
+                {
+                    'id': doc_id,
+                    'content': self._documents[doc_id][0],
+                    'metadata': dict(self._documents[doc_id][1] or {}),
+                    'bm25_score': score
+                }
+                for doc_id, score in ranked
+            ]
+    
+    def _matches(self, doc_id: str, where: Dict[str, Any]) -> bool:
+        metadata = self._documents[doc_id][1] or {}
+        return all(metadata.get(key) == value for key, value in where.items())
+
+def reciprocal_rank_fusion(rankings: List[List[Dict[str, Any]]], k: int = 60) -> List[Dict[str, Any]]:
+    """Birden fazla sıralamayı RRF ile birleştir: skor = Σ 1 / (k + sıra)
+    
+    Aynı kimlikli sonuçların alanları birleştirilir (ör. yoğun aramadan gelen
+    distance ile BM25 skoru), sonuçlar fused_score'a göre azalan sıradadır.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, 1):
+            entry = fused.setdefault(doc['id'], {'fused_score': 0.0})
+            for key, value in doc.items():
+                entry.setdefault(key, value)
+            entry['fused_score'] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda doc: doc['fused_score'], reverse=True)
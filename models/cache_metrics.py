@@ -0,0 +1,201 @@
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, List, Tuple
+
+# Histogram kova üst sınırları (Prometheus 'le' etiketi); son kova +Inf'tir
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_OUTCOMES = ("l1_hits", "l2_hits", "misses")
+_OPERATIONS = ("get", "set")
+_ERROR_OPERATIONS = ("get", "set", "clear", "generation")
+
+def _escape_label(value: str) -> str:
+    """Prometheus etiket değeri kaçışları (\\, \" ve satır sonu)"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Histogram:
+    """Sabit kovalı histogram; gözlem başına bir bisect ve üç toplama"""
+    
+    __slots__ = ("buckets", "counts", "sum", "count")
+    
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+    
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, kümülatif sayı) çiftleri"""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            pairs.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return pairs
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else 0.0,
+            "buckets": dict(self.cumulative())
+        }
+
+class _PrefixMetrics:
+    """Tek bir cache prefix'inin sayaçları"""
+    
+    __slots__ = ("outcomes", "sets", "bytes_written", "errors", "latency",
+                 "encode_seconds", "decode_seconds", "encode_count", "decode_count", "value_bytes")
+    
+    def __init__(self):
+        self.outcomes = dict.fromkeys(_OUTCOMES, 0)
+        self.sets = 0
+        self.bytes_written = 0
+        self.errors = dict.fromkeys(_ERROR_OPERATIONS, 0)
+        self.latency = {operation: Histogram(LATENCY_BUCKETS) for operation in _OPERATIONS}
+        self.encode_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.encode_count = 0
+        self.decode_count = 0
+        self.value_bytes = Histogram(SIZE_BUCKETS)
+
+class CacheMetrics:
+    """CAGCache için prefix bazlı isabet, gecikme, boyut, serileştirme ve hata ölçümleri
+    
+    Sıcak yolda kilit alınmaz: sayaçlar düz int/float toplamalarıdır, bu yüzden
+    yoğun eşzamanlılıkta nadiren bir artış kaybolabilir (istatistik için
+    kabul edilebilir). Kilit yalnızca yeni prefix eklenirken kullanılır.
+    """
+    
+    def __init__(self):
+        self._prefixes = {}
+        self._lock = threading.Lock()
+    
+    def _get(self, prefix: str) -> _PrefixMetrics:
+        metrics = self._prefixes.get(prefix)
+        if metrics is None:
+            with self._lock:
+                metrics = self._prefixes.setdefault(prefix, _PrefixMetrics())
+        return metrics
+    
+    def record(self, prefix: str, outcome: str, count: int = 1):
+        """İsabet/ıskalama say (l1_hits, l2_hits, misses)"""
+        self._get(prefix).outcomes[outcome] += count
+    
+    def observe_latency(self, prefix: str, operation: str, seconds: float):
+        """get/set çağrısının toplam süresi (L1 + Redis + serileştirme)"""
+        self._get(prefix).latency[operation].observe(seconds)
+    
+    def observe_write(self, prefix: str, size: int, encode_seconds: float):
+        """Yazılan tek kaydın boyutu ve serileştirme süresi"""
+        metrics = self._get(prefix)
+        metrics.sets += 1
+        metrics.bytes_written += size
+        metrics.value_bytes.observe(size)
+        metrics.encode_seconds += encode_seconds
+        metrics.encode_count += 1
+    
+    def observe_decode(self, prefix: str, seconds: float):
+        metrics = self._get(prefix)
+        metrics.decode_seconds += seconds
+        metrics.decode_count += 1
+    
+    def record_error(self, prefix: str, operation: str):
+        self._get(prefix).errors[operation] += 1
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """/system/stats için prefix bazlı özet"""
+        with self._lock:
+            prefixes = dict(self._prefixes)
+        
+        summary = {}
+        for prefix, metrics in prefixes.items():
+            lookups = sum(metrics.outcomes.values())
+            hits = metrics.outcomes["l1_hits"] + metrics.outcomes["l2_hits"]
+            summary[prefix] = {
+                **metrics.outcomes,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "sets": metrics.sets,
+                "bytes_written": metrics.bytes_written,
+                "errors": dict(metrics.errors),
+                "get_latency": metrics.latency["get"].snapshot(),
+                "set_latency": metrics.latency["set"].snapshot(),
+                "value_bytes": metrics.value_bytes.snapshot(),
+                "encode_seconds": round(metrics.encode_seconds, 6),
+                "decode_seconds": round(metrics.decode_seconds, 6)
+            }
+        return summary
+    
+    def render_prometheus(self, extra: Dict[str, Tuple[str, str, float]] = None) -> str:
+        """Prometheus metin biçimi (0.0.4); extra: ad -> (tür, açıklama, değer)"""
+        with self._lock:
+            prefixes = sorted((_escape_label(prefix), metrics) for prefix, metrics in self._prefixes.items())
+        
+        lines = []
+        
+        def header(name: str, kind: str, description: str):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+        
+        header("cag_cache_lookups_total", "counter", "Cache lookups by prefix and result")
+        for prefix, metrics in prefixes:
+            for outcome, value in metrics.outcomes.items():
+                lines.append(f'cag_cache_lookups_total{{prefix="{prefix}",result="{outcome}"}} {value}')
+        
+        header("cag_cache_sets_total", "counter", "Entries written by prefix")
+        for prefix, metrics in prefixes:
+            lines.append(f'cag_cache_sets_total{{prefix="{prefix}"}} {metrics.sets}')
+        
+        header("cag_cache_bytes_written_total", "counter", "Serialized bytes written by prefix")
+        for prefix, metrics in prefixes:
+            lines.append(f'cag_cache_bytes_written_total{{prefix="{prefix}"}} {metrics.bytes_written}')
+        
+        header("cag_cache_errors_total", "counter", "Cache errors by prefix and operation")
+        for prefix, metrics in prefixes:
+            for operation, value in metrics.errors.items():
+                lines.append(f'cag_cache_errors_total{{prefix="{prefix}",operation="{operation}"}} {value}')
+        
+        header("cag_cache_serialization_seconds_total", "counter", "Time spent encoding/decoding values")
+        for prefix, metrics in prefixes:
+            lines.append(f'cag_cache_serialization_seconds_total{{prefix="{prefix}",operation="encode"}} {metrics.encode_seconds}')
+            lines.append(f'cag_cache_serialization_seconds_total{{prefix="{prefix}",operation="decode"}} {metrics.decode_seconds}')
+        
+        header("cag_cache_operation_seconds", "histogram", "Cache get/set call latency")
+        for prefix, metrics in prefixes:
+            for operation, histogram in metrics.latency.items():
+                self._render_histogram(lines, "cag_cache_operation_seconds",
+                                       f'prefix="{prefix}",operation="{operation}"', histogram)
+        
+        header("cag_cache_value_bytes", "histogram", "Serialized size of written values")
+        for prefix, metrics in prefixes:
+            self._render_histogram(lines, "cag_cache_value_bytes", f'prefix="{prefix}"', metrics.value_bytes)
+        
+        for name, (kind, description, value) in (extra or {}).items():
+            header(name, kind, description)
+            lines.append(f"{name} {value}")
+        
+        return "\n".join(lines) + "\n"
+    
+    def _render_histogram(self, lines: List[str], name: str, labels: str, histogram: Histogram):
+        for bound, count in histogram.cumulative():
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def get_cache_metrics() -> CacheMetrics:
+    """Süreçteki tüm CAGCache örneklerinin paylaştığı ölçüm kaydı"""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = CacheMetrics()
+    return _metrics
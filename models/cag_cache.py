@@ -1,56 +1,549 @@
-import redis
 import json
+import numpy as np
 import hashlib
-from typing import Any, Optional, Dict, List
+import fnmatch
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Dict, Iterator, List, Tuple, Union
 from config.settings import settings
+from models.redis_connection import get_async_redis_client, get_circuit_breaker, get_redis_client
+from models.cache_metrics import get_cache_metrics
 from datetime import datetime, timedelta
 
+try:
+    import zstandard
+except ImportError:  # zstd isteğe bağlı; yoksa zlib kullanılır
+    zstandard = None
+
+# Cache değer zarfı: MAGIC + sürüm baytı + codec baytı + (sıkıştırılmış) JSON.
+# "{" ile başlayan değerler zarfsız eski (v0) kayıtlardır.
+_ENVELOPE_MAGIC = b"CAG"
+_ENVELOPE_VERSION = 1
+_CODEC_NONE = 0
+_CODEC_ZLIB = 1
+_CODEC_ZSTD = 2
+
+# Prefix başına nesil sayacı; sayaç artınca o prefix'in tüm anahtarları geçersizleşir
+_GENERATION_KEY_PREFIX = "cache_generation:"
+# Desen temizlikleri worker'ların L1'lerine bu sayaç/liste üzerinden yayılır
+# (nesil önekiyle saklanır ki "*" temizliği bunları silmesin)
+_L1_CLEAR_EPOCH_KEY = _GENERATION_KEY_PREFIX + "__l1_clear_epoch__"
+_L1_CLEAR_PATTERNS_KEY = _GENERATION_KEY_PREFIX + "__l1_clear_patterns__"
+_L1_CLEAR_HISTORY = 100
+
+class LocalCacheTier:
+    """Redis önünde çalışan süreç içi LRU/TTL cache katmanı (bayt limitli)
+    
+    Yanıt kayıtları sıkıştırılmamış JSON baytı olarak tutulur (bayt limiti
+    gerçek boyutu sayar) ve her isabette yeniden çözülür; böylece her
+    çağıran kendi nesnesini alır ve onu değiştirmesi cache'i etkilemez. Embedding'ler salt okunur numpy dizileri olarak tutulur.
+    """
+    
+    def __init__(self, max_bytes: int, ttl: int):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._items = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Anahtarın değerini döndür (yoksa veya süresi dolduysa None)"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, size, value = item
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                return None
+            self._items.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: Any, size: int, ttl: int = None):
+        """Değeri ekle; limit aşılırsa en eski kullanılanları çıkar"""
+        if size > self.max_bytes:
+            return
+        ttl = min(ttl or self.ttl, self.ttl)
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            self._items[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._items:
+                self._remove(next(iter(self._items)))
+                self.evictions += 1
+    
+    def invalidate(self, pattern: str = "*") -> int:
+        """Desene uyan anahtarları sil"""
+        with self._lock:
+            if pattern == "*":
+                removed = len(self._items)
+                self._items.clear()
+                self._bytes = 0
+                return removed
+            keys = [key for key in self._items if fnmatch.fnmatchcase(key, pattern)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+    
+    def _remove(self, key: str):
+        _, size, _ = self._items.pop(key)
+        self._bytes -= size
+    
+    def stats(self) -> Dict[str, Any]:
+        """Katman istatistikleri"""
+        with self._lock:
+            return {
+                "items": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+_local_tier = None
+_local_tier_lock = threading.Lock()
+
+def get_local_tier() -> LocalCacheTier:
+    """Süreçteki tüm CAGCache örneklerinin paylaştığı L1 katmanı"""
+    global _local_tier
+    if _local_tier is None:
+        with _local_tier_lock:
+            if _local_tier is None:
+                _local_tier = LocalCacheTier(settings.L1_CACHE_MAX_BYTES, settings.L1_CACHE_TTL)
+    return _local_tier
+
+class GenerationTracker:
+    """Prefix nesillerini süreç içinde tutan ve arka planda tazeleyen izleyici
+    
+    Anahtar üretirken Redis'e gidilmez: bilinen prefix'lerin nesilleri
+    CACHE_GENERATION_REFRESH aralığıyla tek MGET ile arka plan thread'inde
+    güncellenir. Yeni bir prefix yalnızca ilk kullanımda bir kez okunur
+    (async yolda redis.asyncio ile). Aynı döngü, başka worker'ların yayınladığı
+    desen temizliklerini bu sürecin L1 katmanına uygular.
+    """
+    
+    def __init__(self, redis_client, breaker, metrics, local: LocalCacheTier, interval: float):
+        self.redis_client = redis_client
+        self.breaker = breaker
+        self.metrics = metrics
+        self.local = local
+        self.interval = interval
+        self._l1_epoch = None  # Uygulanan son temizlik sayacı
+        self._generations = {}  # prefix -> nesil
+        self._lock = threading.Lock()
+        self._thread = None
+    
+    def get(self, prefix: str) -> Optional[int]:
+        """Bilinen nesil (prefix henüz okunmadıysa None)"""
+        return self._generations.get(prefix)
+    
+    def set(self, prefix: str, generation: int):
+        self._generations[prefix] = generation
+        self._ensure_thread()
+    
+    def load(self, prefix: str) -> int:
+        """Prefix'in neslini Redis'ten bir kez oku ve izlemeye al"""
+        generation = 0
+        if not self.breaker.is_open:
+            try:
+                generation = int(self.redis_client.get(_GENERATION_KEY_PREFIX + prefix) or 0)
+            except Exception as e:
+                self.metrics.record_error(prefix, "generation")
+                print(f"Cache nesli okunamadı: {e}")
+        self._generations.setdefault(prefix, generation)
+        self._ensure_thread()
+        return self._generations[prefix]
+    
+    async def load_async(self, prefix: str, async_client) -> int:
+        """load'un event loop'u bloklamayan sürümü"""
+        generation = 0
+        if not self.breaker.is_open:
+            try:
+                generation = int(await async_client.get(_GENERATION_KEY_PREFIX + prefix) or 0)
+            except Exception as e:
+                self.metrics.record_error(prefix, "generation")
+                print(f"Cache nesli okunamadı: {e}")
+        self._generations.setdefault(prefix, generation)
+        self._ensure_thread()
+        return self._generations[prefix]
+    
+    def refresh(self):
+        """Bilinen prefix'lerin nesillerini ve L1 temizlik sayacını tek MGET ile güncelle"""
+        if self.breaker.is_open:
+            return
+        prefixes = list(self._generations)
+        try:
+            values = self.redis_client.mget(
+                [_GENERATION_KEY_PREFIX + prefix for prefix in prefixes] + [_L1_CLEAR_EPOCH_KEY]
+            )
+            for prefix, value in zip(prefixes, values):
+                self._generations[prefix] = int(value or 0)
+            self._apply_clears(int(values[-1] or 0))
+        except Exception as e:
+            print(f"Cache nesilleri tazelenemedi: {e}")
+    
+    def _apply_clears(self, epoch: int):
+        """Son kontrolden beri yayınlanan temizlik desenlerini L1'e uygula"""
+        if self._l1_epoch is None:
+            # İlk okumada yalnızca başlangıç noktası alınır
+            self._l1_epoch = epoch
+            return
+        if epoch <= self._l1_epoch:
+            return
+        
+        # Sayaç ve desen listesi aynı anda okunur ki yeni yayınlar karışmasın
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.get(_L1_CLEAR_EPOCH_KEY)
+        pipe.lrange(_L1_CLEAR_PATTERNS_KEY, 0, _L1_CLEAR_HISTORY - 1)
+        raw_epoch, raw_patterns = pipe.execute()
+        epoch = int(raw_epoch or 0)
+        missed = epoch - self._l1_epoch
+        if missed > len(raw_patterns):
+            # Geçmiş listesinden fazlası kaçırıldı: tüm L1'i boşalt
+            self.local.invalidate("*")
+        else:
+            for pattern in raw_patterns[:missed]:
+                self.local.invalidate(pattern.decode('utf-8'))
+        self._l1_epoch = epoch
+    
+    def publish_clear(self, pattern: str):
+        """Desen temizliğini diğer worker'ların L1'lerine duyur"""
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.lpush(_L1_CLEAR_PATTERNS_KEY, pattern)
+        pipe.ltrim(_L1_CLEAR_PATTERNS_KEY, 0, _L1_CLEAR_HISTORY - 1)
+        pipe.incr(_L1_CLEAR_EPOCH_KEY)
+        pipe.execute()
+    
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="cache-generations", daemon=True)
+                    self._thread.start()
+    
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.refresh()
+
+_generation_tracker = None
+
+def get_generation_tracker() -> GenerationTracker:
+    """Süreçteki tüm CAGCache örneklerinin paylaştığı nesil izleyici"""
+    global _generation_tracker
+    if _generation_tracker is None:
+        local = get_local_tier()
+        with _local_tier_lock:
+            if _generation_tracker is None:
+                _generation_tracker = GenerationTracker(
+                    get_redis_client(), get_circuit_breaker(), get_cache_metrics(),
+                    local, settings.CACHE_GENERATION_REFRESH
+                )
+                # Temizlik yayınları prefix kullanılmadan da izlensin
+                _generation_tracker._ensure_thread()
+    return _generation_tracker
+
 class CAGCache:
     def __init__(self):
-        self.redis_client = redis.from_url(settings.REDIS_URL)
+        # Bağlantı havuzu ve devre kesici süreçteki tüm örneklerce paylaşılır
+        self.redis_client = get_redis_client()
+        self.breaker = get_circuit_breaker()
         self.ttl = settings.CACHE_TTL
+        self.local = get_local_tier()
+        self.metrics = get_cache_metrics()
+        self.generations = get_generation_tracker()
+    
+    @property
+    def async_client(self):
+        """Çalışan event loop'un redis.asyncio istemcisi (async handler'lar için)"""
+        return get_async_redis_client()
     
     def _generate_key(self, prefix: str, data: Any) -> str:
-        """Cache anahtarı oluştur"""
+        """Cache anahtarı oluştur (nesil 0 iken eski anahtar biçimiyle aynı)"""
         data_str = json.dumps(data, sort_keys=True, ensure_ascii=False)
         hash_value = hashlib.md5(data_str.encode('utf-8')).hexdigest()
+        generation = self.generation(prefix)
+        if generation:
+            return f"{prefix}:g{generation}:{hash_value}"
         return f"{prefix}:{hash_value}"
     
+    def generation(self, prefix: str) -> int:
+        """Prefix'in süreç içinde bilinen nesli (arka planda tazelenir)"""
+        generation = self.generations.get(prefix)
+        if generation is None:
+            generation = self.generations.load(prefix)
+        return generation
+    
+    def invalidate_namespace(self, prefix: str) -> int:
+        """Prefix'in tüm kayıtlarını nesil sayacını artırarak O(1) geçersizleştir
+        
+        Eski nesil anahtarları okunmaz ve TTL ile düşer. Diğer worker'lar yeni
+        nesli en geç CACHE_GENERATION_REFRESH saniye içinde görür.
+        """
+        generation = int(self.redis_client.incr(_GENERATION_KEY_PREFIX + prefix))
+        self.generations.set(prefix, generation)
+        self.local.invalidate(f"{prefix}:*")
+        return generation
+    
+    def _encode_value(self, cached_item: Dict[str, Any]) -> bytes:
+        """Cache kaydını sürümlü zarfa yerleştir, büyükse sıkıştır"""
+        return self._wrap_payload(json.dumps(cached_item, ensure_ascii=False).encode('utf-8'))
+    
+    def _wrap_payload(self, payload: bytes) -> bytes:
+        """JSON baytlarını zarfa koy (CACHE_COMPRESSION_MIN_BYTES üstünde sıkıştır)"""
+        codec = _CODEC_NONE
+        if len(payload) >= settings.CACHE_COMPRESSION_MIN_BYTES:
+            if settings.CACHE_COMPRESSION == "zstd" and zstandard is not None:
+                payload = zstandard.ZstdCompressor().compress(payload)
+                codec = _CODEC_ZSTD
+            elif settings.CACHE_COMPRESSION in ("zlib", "zstd"):
+                payload = zlib.compress(payload)
+                codec = _CODEC_ZLIB
+        return _ENVELOPE_MAGIC + bytes([_ENVELOPE_VERSION, codec]) + payload
+    
+    def _decode_value(self, data: bytes) -> Dict[str, Any]:
+        """Zarflı veya eski (v0) cache kaydını çöz"""
+        return self._decode_payload(self._unwrap_payload(data))
+    
+    def _decode_payload(self, payload: bytes) -> Dict[str, Any]:
+        return json.loads(payload.decode('utf-8'))
+    
+    def _unwrap_payload(self, data: bytes) -> bytes:
+        """Zarfı aç ve (gerekirse açılmış) JSON baytlarını döndür"""
+        if not data.startswith(_ENVELOPE_MAGIC):
+            return data
+        
+        header_size = len(_ENVELOPE_MAGIC) + 2
+        version, codec = data[len(_ENVELOPE_MAGIC)], data[len(_ENVELOPE_MAGIC) + 1]
+        if version != _ENVELOPE_VERSION:
+            raise ValueError(f"Desteklenmeyen cache zarf sürümü: {version}")
+        
+        payload = data[header_size:]
+        if codec == _CODEC_ZLIB:
+            payload = zlib.decompress(payload)
+        elif codec == _CODEC_ZSTD:
+            if zstandard is None:
+                raise ValueError("zstd ile sıkıştırılmış kayıt için zstandard paketi gerekli")
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+        return payload
+    
+    def response_key(self, prefix: str, query_data: Dict[str, Any]) -> str:
+        """get_cached_response/cache_response'un kullandığı Redis anahtarı"""
+        return self._generate_key(prefix, query_data)
+    
     def get_cached_response(self, prefix: str, query_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Cache'den yanıt al"""
-        key = self._generate_key(prefix, query_data)
-        try:
-            cached_data = self.redis_client.get(key)
-            if cached_data:
-                return json.loads(cached_data.decode('utf-8'))
-        except Exception as e:
-            print(f"Cache okuma hatası: {e}")
-        return None
+        return self.get_many(prefix, [query_data])[0]
     
-    def cache_response(self, prefix: str, query_data: Dict[str, Any], response: Dict[str, Any]):
-        """Yanıtı cache'le"""
-        key = self._generate_key(prefix, query_data)
-        try:
+    def cache_response(self, prefix: str, query_data: Dict[str, Any], response: Dict[str, Any],
+                       ttl: int = None):
+        """Yanıtı cache'le (ttl verilmezse CACHE_TTL)"""
+        self.set_many(prefix, [(query_data, response)], ttl)
+    
+    def _lookup_local(self, prefix: str, keys: List[str],
+                      decode: Callable[[Any], Any] = None) -> Tuple[List[Optional[Dict[str, Any]]], List[int]]:
+        """L1'deki kayıtları (verilmişse decode ile çözerek) doldur, Redis'e sorulacak indeksleri döndür"""
+        items = [None] * len(keys)
+        remote_indexes = []
+        for i, key in enumerate(keys):
+            local_item = self.local.get(key)
+            if local_item is not None:
+                items[i] = decode(local_item) if decode is not None else local_item
+            else:
+                remote_indexes.append(i)
+        if len(remote_indexes) < len(keys):
+            self.metrics.record(prefix, "l1_hits", len(keys) - len(remote_indexes))
+        return items, remote_indexes
+    
+    def _fill_remote(self, prefix: str, keys: List[str], items: List[Optional[Dict[str, Any]]],
+                     remote_indexes: List[int], cached_datas: List[Optional[bytes]]):
+        """MGET sonuçlarını çöz, L1'e yaz ve isabet/ıskalama say (çözülemeyen kayıt ıskalamadır)"""
+        for i, cached_data in zip(remote_indexes, cached_datas):
+            if not cached_data:
+                self.metrics.record(prefix, "misses")
+                continue
+            started = time.perf_counter()
+            try:
+                payload = self._unwrap_payload(cached_data)
+                cached_item = self._decode_payload(payload)
+            except Exception as e:
+                self.metrics.record_error(prefix, "get")
+                self.metrics.record(prefix, "misses")
+                print(f"Cache kaydı çözülemedi: {e}")
+                continue
+            self.metrics.observe_decode(prefix, time.perf_counter() - started)
+            # L1 açılmış JSON'u tutar: bütçe gerçek boyutu sayar, isabette açma gerekmez
+            self.local.set(keys[i], payload, len(payload))
+            self.metrics.record(prefix, "l2_hits")
+            items[i] = cached_item
+    
+    def _cache_entries(self, prefix: str, items: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[Tuple[str, bytes, bytes]]:
+        """(anahtar, JSON baytları, zarflı bayt) üçlülerini hazırla"""
+        entries = []
+        for query_data, response in items:
+            # Sorgu verisi (ör. tam prompt) yalnızca anahtarda kullanılır, değere yazılmaz
             cached_item = {
                 "response": response,
-                "timestamp": datetime.now().isoformat(),
-                "query_data": query_data
+                "timestamp": datetime.now().isoformat()
             }
-            self.redis_client.setex(
-                key, 
-                self.ttl, 
-                json.dumps(cached_item, ensure_ascii=False)
-            )
+            started = time.perf_counter()
+            payload = json.dumps(cached_item, ensure_ascii=False).encode('utf-8')
+            serialized = self._wrap_payload(payload)
+            self.metrics.observe_write(prefix, len(serialized), time.perf_counter() - started)
+            entries.append((self._generate_key(prefix, query_data), payload, serialized))
+        return entries
+    
+    def get_many(self, prefix: str, query_datas: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Birden fazla yanıtı önce L1'den, kalanları tek MGET ile Redis'ten al"""
+        started = time.perf_counter()
+        keys = [self._generate_key(prefix, query_data) for query_data in query_datas]
+        items, remote_indexes = self._lookup_local(prefix, keys, self._decode_payload)
+        if remote_indexes:
+            # Devre açıksa Redis erişilemez: zaman aşımı beklemeden ıskala
+            cached_datas = [None] * len(remote_indexes)
+            if not self.breaker.is_open:
+                try:
+                    cached_datas = self.redis_client.mget([keys[i] for i in remote_indexes])
+                except Exception as e:
+                    self.metrics.record_error(prefix, "get")
+                    print(f"Cache okuma hatası: {e}")
+            self._fill_remote(prefix, keys, items, remote_indexes, cached_datas)
+        self.metrics.observe_latency(prefix, "get", time.perf_counter() - started)
+        return items
+    
+    def set_many(self, prefix: str, items: List[Tuple[Dict[str, Any], Dict[str, Any]]], ttl: int = None):
+        """Birden fazla (sorgu verisi, yanıt) çiftini tek pipeline ile cache'le"""
+        if not items:
+            return
+        started = time.perf_counter()
+        try:
+            entries = self._cache_entries(prefix, items)
+            for key, payload, _ in entries:
+                self.local.set(key, payload, len(payload), ttl=ttl)
+            if not self.breaker.is_open:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key, _, serialized in entries:
+                    pipe.setex(key, ttl or self.ttl, serialized)
+                pipe.execute()
         except Exception as e:
+            self.metrics.record_error(prefix, "set")
             print(f"Cache yazma hatası: {e}")
+        self.metrics.observe_latency(prefix, "set", time.perf_counter() - started)
+    
+    async def get_cached_response_async(self, prefix: str, query_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """get_cached_response'un redis.asyncio ile thread'e geçmeden çalışan sürümü"""
+        return (await self.get_many_async(prefix, [query_data]))[0]
+    
+    async def get_many_async(self, prefix: str, query_datas: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """get_many'nin asyncio sürümü"""
+        started = time.perf_counter()
+        if self.generations.get(prefix) is None:
+            await self.generations.load_async(prefix, self.async_client)
+        keys = [self._generate_key(prefix, query_data) for query_data in query_datas]
+        items, remote_indexes = self._lookup_local(prefix, keys, self._decode_payload)
+        if remote_indexes:
+            cached_datas = [None] * len(remote_indexes)
+            if not self.breaker.is_open:
+                try:
+                    cached_datas = await self.async_client.mget([keys[i] for i in remote_indexes])
+                except Exception as e:
+                    self.metrics.record_error(prefix, "get")
+                    print(f"Cache okuma hatası: {e}")
+            self._fill_remote(prefix, keys, items, remote_indexes, cached_datas)
+        self.metrics.observe_latency(prefix, "get", time.perf_counter() - started)
+        return items
+    
+    def _embedding_key(self, text: str) -> str:
+        """Metin, model ve saklama tipine göre embedding anahtarı"""
+        return self._generate_key("embedding", {
+            "text": text,
+            "model": settings.EMBEDDING_MODEL,
+            "dtype": settings.EMBEDDING_CACHE_DTYPE
+        })
     
-    def get_cached_embeddings(self, text: str) -> Optional[List[float]]:
+    def _decode_embedding(self, data: bytes) -> np.ndarray:
+        """Ham baytları kopyalamadan salt okunur vektöre çevir (L1'de paylaşılır)"""
+        embedding = np.frombuffer(data, dtype=settings.EMBEDDING_CACHE_DTYPE)
+        if embedding.dtype != np.float32:
+            embedding = embedding.astype(np.float32)
+            embedding.flags.writeable = False
+        return embedding
+    
+    def _encode_embedding(self, embedding: Union[np.ndarray, List[float]]) -> bytes:
+        """Vektörü ham float baytlarına çevir"""
+        return np.asarray(embedding, dtype=settings.EMBEDDING_CACHE_DTYPE).tobytes()
+    
+    def get_cached_embeddings(self, text: str) -> Optional[np.ndarray]:
         """Cache'den embedding al"""
-        return self.get_cached_response("embedding", {"text": text})
+        return self.get_cached_embeddings_many([text])[0]
     
-    def cache_embeddings(self, text: str, embeddings: List[float]):
+    def cache_embeddings(self, text: str, embeddings: Union[np.ndarray, List[float]]):
         """Embedding'i cache'le"""
-        self.cache_response("embedding", {"text": text}, {"embeddings": embeddings})
+        self.cache_embeddings_many({text: embeddings})
+    
+    def get_cached_embeddings_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Birden fazla embedding'i tek MGET ile cache'den al"""
+        started = time.perf_counter()
+        keys = [self._embedding_key(text) for text in texts]
+        # L1'de olmayanlar Redis'ten tek seferde istenir
+        embeddings, remote_indexes = self._lookup_local("embedding", keys)
+        
+        if remote_indexes:
+            cached_items = [None] * len(remote_indexes)
+            if not self.breaker.is_open:
+                try:
+                    cached_items = self.redis_client.mget([keys[i] for i in remote_indexes])
+                except Exception as e:
+                    self.metrics.record_error("embedding", "get")
+                    print(f"Cache okuma hatası: {e}")
+            
+            for i, cached_data in zip(remote_indexes, cached_items):
+                if not cached_data:
+                    self.metrics.record("embedding", "misses")
+                    continue
+                try:
+                    embedding = self._decode_embedding(cached_data)
+                    if embedding.shape[0] != settings.EMBEDDING_DIMENSION:
+                        raise ValueError(f"{embedding.shape[0]} boyutlu embedding")
+                except Exception as e:
+                    # Bozuk/kesik kayıt ıskalama sayılır; embedding yeniden üretilip üzerine yazılır
+                    self.metrics.record_error("embedding", "get")
+                    self.metrics.record("embedding", "misses")
+                    print(f"Cache kaydı çözülemedi: {e}")
+                    continue
+                self.local.set(keys[i], embedding, embedding.nbytes)
+                self.metrics.record("embedding", "l2_hits")
+                embeddings[i] = embedding
+        self.metrics.observe_latency("embedding", "get", time.perf_counter() - started)
+        return embeddings
+    
+    def cache_embeddings_many(self, items: Dict[str, Union[np.ndarray, List[float]]]):
+        """Birden fazla embedding'i tek pipeline ile cache'le"""
+        if not items:
+            return
+        started = time.perf_counter()
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for text, embeddings in items.items():
+                key = self._embedding_key(text)
+                encode_started = time.perf_counter()
+                data = self._encode_embedding(embeddings)
+                self.metrics.observe_write("embedding", len(data), time.perf_counter() - encode_started)
+                pipe.setex(key, self.ttl, data)
+                embedding = self._decode_embedding(data)
+                self.local.set(key, embedding, embedding.nbytes)
+            if not self.breaker.is_open:
+                pipe.execute()
+        except Exception as e:
+            self.metrics.record_error("embedding", "set")
+            print(f"Cache yazma hatası: {e}")
+        self.metrics.observe_latency("embedding", "set", time.perf_counter() - started)
     
     def get_cached_questions(self, topic: str, difficulty: str) -> Optional[List[Dict[str, Any]]]:
         """Cache'den soruları al"""
@@ -60,11 +553,71 @@ class CAGCache:
         """Soruları cache'le"""
         self.cache_response("questions", {"topic": topic, "difficulty": difficulty}, {"questions": questions})
     
-    def clear_cache(self, pattern: str = "*"):
-        """Cache'i temizle"""
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache katmanlarının ve prefix bazlı ölçümlerin özeti"""
+        return {
+            "prefixes": self.metrics.snapshot(),
+            "l1": self.local.stats(),
+            "redis": {
+                "circuit_breaker": self.breaker.stats(),
+                "max_connections": settings.REDIS_MAX_CONNECTIONS
+            }
+        }
+    
+    def render_metrics(self) -> str:
+        """Ölçümleri ve katman durumlarını Prometheus metin biçiminde döndür"""
+        l1 = self.local.stats()
+        breaker = self.breaker.stats()
+        return self.metrics.render_prometheus({
+            "cag_cache_l1_items": ("gauge", "Entries in the in-process L1 tier", l1["items"]),
+            "cag_cache_l1_bytes": ("gauge", "Bytes held by the in-process L1 tier", l1["bytes"]),
+            "cag_cache_l1_evictions_total": ("counter", "L1 entries evicted by the byte limit", l1["evictions"]),
+            "cag_cache_l1_expirations_total": ("counter", "L1 entries dropped after TTL", l1["expirations"]),
+            "cag_cache_redis_circuit_open": ("gauge", "1 while the Redis circuit breaker is open", int(breaker["state"] != "closed")),
+            "cag_cache_redis_rejected_calls_total": ("counter", "Redis calls skipped by the circuit breaker", breaker["rejected_calls"])
+        })
+    
+    def iter_clear(self, pattern: str = "*") -> Iterator[Tuple[int, int]]:
+        """Desene uyan anahtarları SCAN ile adım adım bulup UNLINK ile toplu sil
+        
+        Sunucuyu bloklayan KEYS yerine imleçli tarama yapılır; her silinen
+        toplu işten sonra (taranan, silinen) ilerlemesi üretilir. Nesil
+        sayaçları silinmez. Bitince desen diğer worker'lara yayınlanır; onlar
+        L1'lerini en geç CACHE_GENERATION_REFRESH saniye içinde temizler.
+        """
+        # Süreç içi katman Redis'ten bağımsız olarak her durumda temizlenir
+        self.local.invalidate(pattern)
+        generation_prefix = _GENERATION_KEY_PREFIX.encode('utf-8')
+        scanned = 0
+        deleted = 0
+        batch = []
+        try:
+            for key in self.redis_client.scan_iter(match=pattern, count=settings.CACHE_CLEAR_SCAN_COUNT):
+                scanned += 1
+                if key.startswith(generation_prefix):
+                    continue
+                batch.append(key)
+                if len(batch) >= settings.CACHE_CLEAR_BATCH_SIZE:
+                    deleted += self.redis_client.unlink(*batch)
+                    batch = []
+                    yield scanned, deleted
+            if batch:
+                deleted += self.redis_client.unlink(*batch)
+            # Tarama sırasında L1'e geri dolan kayıtlar da düşsün
+            self.local.invalidate(pattern)
+            self.generations.publish_clear(pattern)
+        except Exception:
+            # Desen kullanıcıdan gelir; etiket kümesi sınırlı kalsın diye sabit prefix
+            self.metrics.record_error("clear", "clear")
+            raise
+        yield scanned, deleted
+    
+    def clear_cache(self, pattern: str = "*") -> int:
+        """Cache'i temizle, silinen anahtar sayısını döndür"""
+        deleted = 0
         try:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                self.redis_client.delete(*keys)
+            for _, deleted in self.iter_clear(pattern):
+                pass
         except Exception as e:
-            print(f"Cache temizleme hatası: {e}")
\ No newline at end of file
+            print(f"Cache temizleme hatası: {e}")
+        return deleted
@@ -0,0 +1,126 @@
+from typing import Any, Callable, Dict, List
+import numpy as np
+from utils.text_processor import TextProcessor
+from config.settings import settings
+
+CONTEXT_HEADER = "İlgili Müfredat İçeriği:\n\n"
+
+class ContextBuilder:
+    """Karakter bütçesine göre bağlam metni oluşturucu
+    
+    Dokümanlar cümlelere bölünür, sorguya en ilgili cümleler MMR ile çeşitlilik
+    gözetilerek seçilir, neredeyse aynı cümleler atlanır. Seçilen cümleler
+    doküman sırası korunarak tek bir join ile birleştirilir.
+    """
+    
+    def __init__(self, text_processor: TextProcessor, embed: Callable[[List[str]], List[np.ndarray]]):
+        self.text_processor = text_processor
+        self.embed = embed
+    
+    def split_passages(self, content: str) -> List[str]:
+        """Dokümanı cümlelere, uzun cümleleri kelime pencerelerine böl
+        
+        Temizlenmiş içerikte noktalama kalmadığından cümle bölücü çoğu zaman
+        tek parça döndürür; pencereleme seçimi yine de ince taneli tutar.
+        """
+        max_words = settings.CONTEXT_SENTENCE_MAX_WORDS
+        passages = []
+        for sentence in self.text_processor.split_into_sentences(content):
+            words = sentence.split()
+            for start in range(0, len(words), max_words):
+                passages.append(' '.join(words[start:start + max_words]))
+        return passages
+    
+    def build(self, query_embedding: np.ndarray, documents: List[Dict[str, Any]],
+              max_chars: int = None) -> Dict[str, Any]:
+        """Bütçe içinde bağlamı oluştur; kullanılan doküman kimlikleri ve bütçe raporuyla döndür"""
+        max_chars = settings.CONTEXT_MAX_CHARS if max_chars is None else max_chars
+        
+        # Aday cümleler (birebir tekrarlar tek kez alınır)
+        candidates = []
+        seen = set()
+        for doc_index, doc in enumerate(documents):
+            for position, passage in enumerate(self.split_passages(doc['content'])):
+                key = passage.casefold()
+                if key and key not in seen:
+                    seen.add(key)
+                    candidates.append((doc_index, position, passage))
+        
+        selected = self._select(query_embedding, documents, candidates, max_chars) if candidates else []
+        context = self._render(documents, candidates, selected)
+        used_docs = sorted({candidates[i][0] for i in selected})
+        
+        return {
+            "context": context,
+            "source_ids": [documents[i]['id'] for i in used_docs],
+            "budget": {
+                "max_chars": max_chars,
+                "used_chars": len(context),
+                "sentences_considered": len(candidates),
+                "sentences_selected": len(selected),
+                "documents_used": len(used_docs)
+            }
+        }
+    
+    def _select(self, query_embedding: np.ndarray, documents: List[Dict[str, Any]],
+                candidates: List[tuple], max_chars: int) -> List[int]:
+        """MMR ile bütçeye sığan cümleleri seç"""
+        vectors = np.asarray(self.embed([passage for _, _, passage in candidates]), dtype=np.float32)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        
+        relevance = vectors @ query
+        redundancy = np.full(len(candidates), -1.0, dtype=np.float32)
+        available = np.ones(len(candidates), dtype=bool)
+        lam = settings.CONTEXT_MMR_LAMBDA
+        
+        remaining = max_chars - len(CONTEXT_HEADER)
+        opened_docs = set()
+        selected = []
+        while available.any():
+            scores = np.where(available, lam * relevance - (1 - lam) * np.maximum(redundancy, 0.0), -np.inf)
+            best = int(np.argmax(scores))
+            available[best] = False
+            
+            doc_index, _, passage = candidates[best]
+            cost = len(passage) + 1
+            if doc_index not in opened_docs:
+                cost += self._block_overhead(documents[doc_index])
+            if cost > remaining:
+                # Sığmayan cümleyi atla, daha kısa adaylar hâlâ sığabilir
+                continue
+            
+            selected.append(best)
+            opened_docs.add(doc_index)
+            remaining -= cost
+            
+            similarity = vectors @ vectors[best]
+            redundancy = np.maximum(redundancy, similarity)
+            # Seçilene neredeyse aynı olan cümleler bir daha değerlendirilmez
+            available &= similarity < settings.CONTEXT_DUPLICATE_THRESHOLD
+        
+        return selected
+    
+    def _block_overhead(self, doc: Dict[str, Any]) -> int:
+        """Bir doküman bloğunun cümleler dışındaki karakter maliyeti (üst sınır)"""
+        overhead = len("99. ") + 1
+        keywords = doc['metadata'].get('keywords')
+        if keywords:
+            overhead += len(f"   Anahtar Kelimeler: {keywords}\n")
+        return overhead
+    
+    def _render(self, documents: List[Dict[str, Any]], candidates: List[tuple], selected: List[int]) -> str:
+        """Seçilen cümleleri doküman ve cümle sırasıyla bağlam metnine dönüştür"""
+        by_doc = {}
+        for i in sorted(selected, key=lambda i: candidates[i][:2]):
+            by_doc.setdefault(candidates[i][0], []).append(candidates[i][2])
+        
+        parts = [CONTEXT_HEADER]
+        for number, doc_index in enumerate(sorted(by_doc), 1):
+            parts.append(f"{number}. {' '.join(by_doc[doc_index])}\n")
+            keywords = documents[doc_index]['metadata'].get('keywords')
+            if keywords:
+                parts.append(f"   Anahtar Kelimeler: {keywords}\n")
+            parts.append("\n")
+        return ''.join(parts)
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import numpy as np
+from config.settings import settings
+
+SNAPSHOT_FORMAT_VERSION = 1
+MATRIX_FILE = "embeddings.npy"
+DOCUMENTS_FILE = "documents.json"
+MANIFEST_FILE = "manifest.json"
+
+class EmbeddingSnapshot:
+    """Çevrimdışı üretilen doküman embedding matrisi ve metadata'sı
+    
+    Matris salt okunur memory-map ile açılır; aynı makinedeki tüm worker'lar
+    tek bir sayfa önbelleği kopyasını paylaşır.
+    """
+    
+    def __init__(self, path: str, manifest: Dict[str, Any], matrix: np.ndarray,
+                 ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        self.path = path
+        self.manifest = manifest
+        self.matrix = matrix
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+    
+    def vectors_by_id(self) -> Dict[str, np.ndarray]:
+        """Kimlik -> vektör (memory-map görünümü, kopya yok)"""
+        return {doc_id: self.matrix[i] for i, doc_id in enumerate(self.ids)}
+
+def _corpus_hash(ids: List[str]) -> str:
+    """İçerik tabanlı kimliklerden derlem özeti"""
+    return hashlib.sha256("\n".join(sorted(ids)).encode('utf-8')).hexdigest()
+
+def _file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def build_embedding_snapshot(rag_system, documents: List[Dict[str, Any]], path: str = None) -> Dict[str, Any]:
+    """Dokümanların embedding'lerini üretip snapshot dizinine yaz, manifest'i döndür"""
+    path = path or settings.EMBEDDING_SNAPSHOT_PATH
+    os.makedirs(path, exist_ok=True)
+    
+    prepared = rag_system.prepare_documents(documents)
+    ids = list(prepared.keys())
+    contents = [doc['content'] for doc, _ in prepared.values()]
+    metadatas = [metadata for _, metadata in prepared.values()]
+    # Birim uzunlukta saklanır: yerel indeks matrisi kopyalamadan kullanabilir
+    matrix = (
+        rag_system.embedding_generator.encode_candidates(contents)
+        if contents else np.zeros((0, 0), dtype=np.float32)
+    )
+    
+    # Önce geçici dosyalara yaz, sonra atomik olarak yerine koy
+    matrix_path = os.path.join(path, MATRIX_FILE)
+    documents_path = os.path.join(path, DOCUMENTS_FILE)
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    np.save(matrix_path + ".tmp.npy", matrix)
+    with open(documents_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump({"ids": ids, "documents": contents, "metadatas": metadatas}, f, ensure_ascii=False)
+    
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "model": settings.EMBEDDING_MODEL,
+        "dtype": "float32",
+        "normalized": True,
+        "count": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        "corpus_hash": _corpus_hash(ids),
+        "matrix_sha256": _file_sha256(matrix_path + ".tmp.npy"),
+        "documents_sha256": _file_sha256(documents_path + ".tmp"),
+        "created_at": datetime.now().isoformat()
+    }
+    with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    
+    os.replace(matrix_path + ".tmp.npy", matrix_path)
+    os.replace(documents_path + ".tmp", documents_path)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return manifest
+
+def load_embedding_snapshot(path: str = None, verify: bool = False) -> Optional[EmbeddingSnapshot]:
+    """Snapshot'ı memory-map ile aç; yoksa veya uyumsuzsa None döndür
+    
+    verify=True dosya özetlerini de kontrol eder (tüm dosyayı okur). Model ve
+    boyut ayarlarla karşılaştırılır; embedding modeli yüklenmez.
+    """
+    path = path or settings.EMBEDDING_SNAPSHOT_PATH
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    matrix_path = os.path.join(path, MATRIX_FILE)
+    documents_path = os.path.join(path, DOCUMENTS_FILE)
+    if not all(os.path.exists(p) for p in (manifest_path, matrix_path, documents_path)):
+        return None
+    
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            print(f"Embedding snapshot sürümü desteklenmiyor: {manifest.get('format_version')}")
+            return None
+        if manifest.get("model") != settings.EMBEDDING_MODEL:
+            print(f"Embedding snapshot farklı bir modelle üretilmiş: {manifest.get('model')}")
+            return None
+        if manifest.get("count") and manifest.get("dim") != settings.EMBEDDING_DIMENSION:
+            print(f"Embedding snapshot boyutu ({manifest.get('dim')}) EMBEDDING_DIMENSION ile uyuşmuyor")
+            return None
+        if verify and (
+            _file_sha256(matrix_path) != manifest.get("matrix_sha256")
+            or _file_sha256(documents_path) != manifest.get("documents_sha256")
+        ):
+            print("Embedding snapshot dosya özeti manifest ile uyuşmuyor")
+            return None
+        
+        with open(documents_path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        matrix = np.load(matrix_path, mmap_mode='r')
+        if matrix.shape[0] != manifest.get("count") or len(records['ids']) != matrix.shape[0]:
+            print("Embedding snapshot boyutları manifest ile uyuşmuyor")
+            return None
+        if matrix.shape[0] and (matrix.ndim != 2 or matrix.shape[1] != manifest.get("dim")):
+            print("Embedding snapshot matris genişliği manifest ile uyuşmuyor")
+            return None
+        if _corpus_hash(records['ids']) != manifest.get("corpus_hash"):
+            print("Embedding snapshot derlem özeti manifest ile uyuşmuyor")
+            return None
+    except Exception as e:
+        print(f"Embedding snapshot okuma hatası: {e}")
+        return None
+    
+    return EmbeddingSnapshot(path, manifest, matrix, records['ids'], records['documents'], records['metadatas'])
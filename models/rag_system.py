@@ -1,70 +1,215 @@
-import chromadb
-from chromadb.config import Settings as ChromaSettings
 from typing import List, Dict, Any, Optional
-import uuid
+import hashlib
+import json
+import numpy as np
 from utils.embeddings import EmbeddingGenerator
 from utils.text_processor import TextProcessor
 from models.cag_cache import CAGCache
+from models.vector_store import VectorStore, create_vector_store
+from models.bm25_index import BM25Index, reciprocal_rank_fusion
+from models.context_builder import CONTEXT_HEADER, ContextBuilder
+from utils.chunking import DocumentChunker
 from config.settings import settings
+from utils.concurrency import run_blocking
 
 class RAGSystem:
-    def __init__(self):
-        self.embedding_generator = EmbeddingGenerator()
-        self.text_processor = TextProcessor()
-        self.cache = CAGCache()
-        
-        # ChromaDB istemcisini başlat
-        self.chroma_client = chromadb.PersistentClient(
-            path=settings.CHROMA_DB_PATH,
-            settings=ChromaSettings(anonymized_telemetry=False)
-        )
+    def __init__(self, embedding_generator: EmbeddingGenerator = None,
+                 text_processor: TextProcessor = None, cache: CAGCache = None,
+                 store: VectorStore = None, chunker: DocumentChunker = None):
+        self.embedding_generator = embedding_generator or EmbeddingGenerator()
+        self.text_processor = text_processor or TextProcessor()
+        self.cache = cache or CAGCache()
         
-        # Koleksiyon oluştur veya al
-        try:
-            self.collection = self.chroma_client.get_collection("din_kulturu_curriculum")
-        except:
-            self.collection = self.chroma_client.create_collection(
-                name="din_kulturu_curriculum",
-                metadata={"description": "LGS Din Kültürü Müfredatı"}
-            )
+        # Retrieval arka ucu (Settings.RETRIEVAL_BACKEND: chroma | local)
+        self.store = store or create_vector_store()
+        
+        # Kısa, terim ağırlıklı sorgular için sözcüksel indeks (add_documents ile doldurulur)
+        self.lexical_index = BM25Index(self.text_processor.tokenize, k1=settings.BM25_K1, b=settings.BM25_B)
+        # Cümle embedding'leri doküman embedding'leriyle aynı cache yolundan geçer
+        self.context_builder = ContextBuilder(self.text_processor, self._embed_documents)
+        
+        # Parçalar indekslenir; üst dokümanlar genişletme için bellekte tutulur (kimlik -> (içerik, metadata))
+        self.chunker = chunker or DocumentChunker(self.text_processor)
+        self._parents = {}
+    
+    def document_count(self) -> int:
+        """İndeksteki doküman sayısı"""
+        return self.store.count()
+    
+    def _document_id(self, doc: Dict[str, Any]) -> str:
+        """İçerikten türetilen kararlı doküman kimliği"""
+        return hashlib.md5(doc['content'].encode('utf-8')).hexdigest()
+    
+    def _document_metadata(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Dokümanın indeks metadata'sını oluştur"""
+        metadata = {
+            'topic': doc.get('topic', ''),
+            'subtopic': doc.get('subtopic', ''),
+            'difficulty': doc.get('difficulty', 'orta'),
+            'source': doc.get('source', ''),
+            'keywords': ','.join(doc.get('keywords', []))
+        }
+        if 'parent_id' in doc:
+            # Parça -> üst doküman eşlemesi parçanın kendi metadata'sında saklanır
+            metadata['parent_id'] = doc['parent_id']
+            metadata['chunk_index'] = doc['chunk_index']
+        # Metadata değişikliklerini yeniden embedding üretmeden fark etmek için parmak izi
+        fingerprint = json.dumps(metadata, sort_keys=True, ensure_ascii=False)
+        metadata['fingerprint'] = hashlib.md5(fingerprint.encode('utf-8')).hexdigest()
+        return metadata
     
-    def add_documents(self, documents: List[Dict[str, Any]]):
-        """Dokümanları RAG sistemine ekle"""
+    def chunk_documents(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Dokümanları indekslenecek parçalara böl ve üst dokümanları kaydet
+        
+        CHUNKING_ENABLED kapalıysa dokümanlar olduğu gibi döner.
+        """
+        if not settings.CHUNKING_ENABLED:
+            return list(documents)
+        
+        for doc in documents:
+            self._parents[self.chunker.parent_id(doc)] = (doc['content'], self._document_metadata(doc))
+        return self.chunker.chunk_documents(documents)
+    
+    def _lexical_text(self, doc: Dict[str, Any], metadata: Dict[str, Any]) -> str:
+        """BM25 için indekslenecek metin: içerik, alt konu ve anahtar kelimeler"""
+        keywords = doc.get('all_keywords') or doc.get('keywords', [])
+        return ' '.join([doc['content'], metadata['subtopic'], ' '.join(keywords)])
+    
+    def prepare_documents(self, documents: List[Dict[str, Any]]) -> Dict[str, tuple]:
+        """Dokümanları indekse yazılacak biçime getir: kimlik -> (doküman, metadata)"""
+        # Aynı içerik birden fazla kez gelirse tek kayıt tut
+        prepared = {}
         for doc in documents:
-            # Cache'den embedding kontrolü
-            cached_embedding = self.cache.get_cached_embeddings(doc['content'])
+            prepared[self._document_id(doc)] = (doc, self._document_metadata(doc))
+        return prepared
+    
+    def add_documents(self, documents: List[Dict[str, Any]],
+                      precomputed: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, int]:
+        """Dokümanları RAG sistemine ekle (yalnızca yeni veya değişmiş olanlar yazılır)
+        
+        precomputed (kimlik -> vektör) verilirse bu embedding'ler model ve
+        cache'e gidilmeden kullanılır.
+        """
+        pending = self.prepare_documents(documents)
+        
+        if not pending:
+            return {"added": 0, "updated": 0, "unchanged": 0}
+        
+        # İndekste zaten bulunan kayıtları tek seferde al
+        existing_fingerprints = self.store.get_fingerprints(list(pending.keys()))
+        
+        new_docs = {}
+        changed_metadatas = {}
+        unchanged = 0
+        for doc_id, (doc, metadata) in pending.items():
+            # Sözcüksel indeks süreç içinde tutulur: değişmeyen dokümanlar da ilk çağrıda indekslenir
+            if self.lexical_index.fingerprint(doc_id) != metadata['fingerprint']:
+                self.lexical_index.add(doc_id, self._lexical_text(doc, metadata), doc['content'], metadata)
             
-            if cached_embedding:
-                embedding = cached_embedding['embeddings']
-            else:
-                # Yeni embedding oluştur
-                embedding = self.embedding_generator.encode(doc['content']).tolist()
-                self.cache.cache_embeddings(doc['content'], embedding)
+            if doc_id in existing_fingerprints:
+                if existing_fingerprints[doc_id] == metadata['fingerprint']:
+                    unchanged += 1
+                else:
+                    # İçerik aynı, sadece metadata değişmiş: embedding gerekmez
+                    changed_metadatas[doc_id] = metadata
+                continue
+            
+            new_docs[doc_id] = (doc, metadata)
+        
+        if changed_metadatas:
+            self.store.update_metadatas(list(changed_metadatas.keys()), list(changed_metadatas.values()))
+        
+        if new_docs:
+            contents = [doc['content'] for doc, _ in new_docs.values()]
+            precomputed = precomputed or {}
+            embeddings = [precomputed.get(doc_id) for doc_id in new_docs]
+            missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+            if missing:
+                for i, embedding in zip(missing, self._embed_documents([contents[i] for i in missing])):
+                    embeddings[i] = embedding
             
-            # ChromaDB'ye ekle
-            self.collection.add(
-                documents=[doc['content']],
-                embeddings=[embedding],
-                metadatas=[{
-                    'topic': doc.get('topic', ''),
-                    'subtopic': doc.get('subtopic', ''),
-                    'difficulty': doc.get('difficulty', 'orta'),
-                    'source': doc.get('source', ''),
-                    'keywords': ','.join(doc.get('keywords', []))
-                }],
-                ids=[str(uuid.uuid4())]
+            # İndekse tek seferde ekle
+            self.store.add(
+                ids=list(new_docs.keys()),
+                embeddings=embeddings,
+                documents=contents,
+                metadatas=[metadata for _, metadata in new_docs.values()]
             )
+        
+        return {"added": len(new_docs), "updated": len(changed_metadatas), "unchanged": unchanged}
     
-    def search_relevant_documents(self, query: str, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-        """İlgili dokümanları ara"""
-        # Query embedding'i al
-        cached_query_embedding = self.cache.get_cached_embeddings(query)
+    def _embed_documents(self, contents: List[str]) -> List[np.ndarray]:
+        """Embedding'leri toplu üret: tek cache okuması, tek model çağrısı, tek cache yazması"""
+        embeddings = self.cache.get_cached_embeddings_many(contents)
         
-        if cached_query_embedding:
-            query_embedding = cached_query_embedding['embeddings']
-        else:
-            query_embedding = self.embedding_generator.encode(query).tolist()
-            self.cache.cache_embeddings(query, query_embedding)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = self.embedding_generator.encode([contents[i] for i in missing])
+            new_items = {}
+            for i, vector in zip(missing, encoded):
+                embeddings[i] = vector
+                new_items[contents[i]] = vector
+            self.cache.cache_embeddings_many(new_items)
+        
+        return embeddings
+    
+    def delete_documents(self, ids: List[str]) -> int:
+        """Verilen kimliklere sahip dokümanları sil"""
+        if not ids:
+            return 0
+        self.store.delete(list(ids))
+        self.lexical_index.remove(list(ids))
+        return len(ids)
+    
+    def sync_documents(self, documents: List[Dict[str, Any]], snapshot=None) -> Dict[str, int]:
+        """Koleksiyonu verilen doküman kümesiyle eşitle (eksikleri ekle, kaldırılanları sil)
+        
+        Geçerli bir EmbeddingSnapshot verilirse yerel indeks doğrudan onun
+        memory-map'ine bağlanır, diğer arka uçlar eksik vektörleri ondan alır.
+        """
+        precomputed = None
+        if snapshot is not None:
+            self.store.attach_snapshot(snapshot)
+            precomputed = snapshot.vectors_by_id()
+        
+        stats = self.add_documents(documents, precomputed=precomputed)
+        
+        wanted_ids = {self._document_id(doc) for doc in documents}
+        stored_ids = self.store.all_ids()
+        # Eski uuid kimlikli kopyalar da burada temizlenir
+        stale_ids = [doc_id for doc_id in stored_ids if doc_id not in wanted_ids]
+        stats["deleted"] = self.delete_documents(stale_ids)
+        
+        return stats
+    
+    def _query_embedding(self, query: str) -> np.ndarray:
+        """Sorgu embedding'ini cache'ten al, yoksa üretip cache'le"""
+        return self._embed_documents([query])[0]
+    
+    def search_relevant_documents(self, query: str, filters: Optional[Dict[str, Any]] = None,
+                                  n_results: int = None, expand_to_parent: bool = False) -> List[Dict[str, Any]]:
+        """İlgili dokümanları ara
+        
+        HYBRID_RETRIEVAL açıksa yoğun (embedding) ve BM25 sonuçları reciprocal
+        rank fusion ile birleştirilir; yalnızca BM25'ten gelen sonuçlarda
+        distance None olur. expand_to_parent=True ise parçalar üst dokümanlarıyla
+        değiştirilir (bkz. expand_to_parents).
+        """
+        return self.search_many([query], filters, n_results, expand_to_parent)[0]
+    
+    def search_many(self, queries: List[str], filters: Optional[Dict[str, Any]] = None,
+                    n_results: int = None, expand_to_parent: bool = False) -> List[List[Dict[str, Any]]]:
+        """Birden fazla sorguyu toplu ara; sonuçlar sorgu sırasıyla gruplanır
+        
+        Tüm sorgu embedding'leri tek cache okuması ve tek model çağrısıyla
+        alınır, vektör deposuna tek çok-sorgulu istek gider. Tekrarlanan
+        sorgular bir kez aranır. Filtreler tüm sorgulara uygulanır.
+        """
+        if not queries:
+            return []
+        
+        unique_queries = list(dict.fromkeys(queries))
+        query_embeddings = self._embed_documents(unique_queries)
         
         # Filtreleri hazırla
         where_clause = {}
@@ -73,35 +218,114 @@ class RAGSystem:
                 if value:
                     where_clause[key] = value
         
+        n_results = n_results or settings.TOP_K_DOCUMENTS
+        hybrid = settings.HYBRID_RETRIEVAL and len(self.lexical_index) > 0
+        # Füzyonun yeniden sıralayabilmesi için her iki listeden daha geniş aday havuzu al
+        pool_size = n_results * settings.HYBRID_CANDIDATE_MULTIPLIER if hybrid else n_results
+        
         # Arama yap
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=settings.TOP_K_DOCUMENTS,
+        dense_results = self.store.query(
+            query_embeddings,
+            n_results=pool_size,
             where=where_clause if where_clause else None
         )
         
-        # Sonuçları düzenle
-        documents = []
-        for i in range(len(results['documents'][0])):
-            documents.append({
-                'content': results['documents'][0][i],
-                'metadata': results['metadatas'][0][i],
-                'distance': results['distances'][0][i] if 'distances' in results else 0,
-                'id': results['ids'][0][i]
-            })
+        results = {}
+        for query, dense_docs in zip(unique_queries, dense_results):
+            if hybrid:
+                lexical_docs = self.lexical_index.search(query, pool_size, where_clause or None)
+                docs = reciprocal_rank_fusion([dense_docs, lexical_docs], k=settings.RRF_K)[:n_results]
+                for doc in docs:
+                    doc.setdefault('distance', None)
+            else:
+                docs = dense_docs
+            results[query] = self.expand_to_parents(docs) if expand_to_parent else docs
+        
+        return [results[query] for query in queries]
+    
+    def expand_to_parents(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Parça sonuçlarını üst dokümanlarına genişlet
         
-        return documents
+        Aynı üst dokümana ait parçalar ilk göründükleri sırada tek sonuçta
+        birleşir; eşleşen parçaların kimlikleri matched_chunks alanında kalır.
+        Kayıtlı üst dokümanı olmayan sonuçlar değiştirilmez.
+        """
+        expanded = {}
+        for doc in docs:
+            parent_id = (doc.get('metadata') or {}).get('parent_id')
+            if parent_id not in self._parents:
+                expanded.setdefault(doc['id'], doc)
+                continue
+            
+            if parent_id in expanded:
+                parent = expanded[parent_id]
+                parent['matched_chunks'].append(doc['id'])
+                if doc['distance'] is not None and (parent['distance'] is None or doc['distance'] < parent['distance']):
+                    parent['distance'] = doc['distance']
+                continue
+            
+            content, metadata = self._parents[parent_id]
+            expanded[parent_id] = {
+                'id': parent_id,
+                'content': content,
+                'metadata': metadata,
+                'distance': doc['distance'],
+                'matched_chunks': [doc['id']]
+            }
+        return list(expanded.values())
     
     def get_context_for_query(self, query: str, topic: str = None) -> str:
         """Query için bağlam oluştur"""
+        return self.get_context_bundle(query, topic)['context']
+    
+    def get_context_bundle(self, query: str, topic: str = None, max_chars: int = None) -> Dict[str, Any]:
+        """Query için bağlamı, kullanılan doküman kimlikleri ve bütçe raporuyla döndür
+        
+        CONTEXT_MAX_CHARS (veya max_chars) 0 ise dokümanlar bütün olarak eklenir.
+        """
         filters = {'topic': topic} if topic else None
         relevant_docs = self.search_relevant_documents(query, filters)
+        return self.build_context_bundle(query, relevant_docs, max_chars)
+    
+    def build_context_bundle(self, query: str, relevant_docs: List[Dict[str, Any]],
+                             max_chars: int = None) -> Dict[str, Any]:
+        """Önceden bulunmuş dokümanlardan bütçeli bağlam oluştur (get_context_bundle ile aynı yol)"""
+        max_chars = settings.CONTEXT_MAX_CHARS if max_chars is None else max_chars
+        if max_chars > 0 and relevant_docs:
+            return self.context_builder.build(self._query_embedding(query), relevant_docs, max_chars)
         
-        context = "İlgili Müfredat İçeriği:\n\n"
+        context = self.format_context(relevant_docs)
+        return {
+            "context": context,
+            "source_ids": [doc['id'] for doc in relevant_docs],
+            "budget": {"max_chars": max_chars, "used_chars": len(context)}
+        }
+    
+    def format_context(self, relevant_docs: List[Dict[str, Any]]) -> str:
+        """Bulunan dokümanlardan (bütün olarak) bağlam metni oluştur"""
+        parts = [CONTEXT_HEADER]
         for i, doc in enumerate(relevant_docs):
-            context += f"{i+1}. {doc['content']}\n"
+            parts.append(f"{i+1}. {doc['content']}\n")
             if doc['metadata'].get('keywords'):
-                context += f"   Anahtar Kelimeler: {doc['metadata']['keywords']}\n"
-            context += "\n"
+                parts.append(f"   Anahtar Kelimeler: {doc['metadata']['keywords']}\n")
+            parts.append("\n")
         
-        return context
\ No newline at end of file
+        return ''.join(parts)
+    
+    async def search_relevant_documents_async(self, query: str, filters: Optional[Dict[str, Any]] = None,
+                                              expand_to_parent: bool = False) -> List[Dict[str, Any]]:
+        """search_relevant_documents'ın event loop'u bloklamayan sürümü"""
+        return await run_blocking(self.search_relevant_documents, query, filters, expand_to_parent=expand_to_parent)
+    
+    async def search_many_async(self, queries: List[str], filters: Optional[Dict[str, Any]] = None,
+                                n_results: int = None, expand_to_parent: bool = False) -> List[List[Dict[str, Any]]]:
+        """search_many'nin event loop'u bloklamayan sürümü"""
+        return await run_blocking(self.search_many, queries, filters, n_results, expand_to_parent)
+    
+    async def get_context_for_query_async(self, query: str, topic: str = None) -> str:
+        """get_context_for_query'nin event loop'u bloklamayan sürümü"""
+        return await run_blocking(self.get_context_for_query, query, topic)
+    
+    async def get_context_bundle_async(self, query: str, topic: str = None) -> Dict[str, Any]:
+        """get_context_bundle'ın event loop'u bloklamayan sürümü"""
+        return await run_blocking(self.get_context_bundle, query, topic)
\ No newline at end of file
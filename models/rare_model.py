@@ -1,23 +1,34 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Iterator
 from models.rag_system import RAGSystem
 from services.gemini_service import GeminiService
 from models.cag_cache import CAGCache
+from models.semantic_cache import SemanticCache
 from utils.text_processor import TextProcessor
 from config.settings import settings
+from utils.concurrency import run_blocking, map_with_timeout
 import json
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 class RAREModel:
-    def __init__(self):
-        self.rag_system = RAGSystem()
-        self.gemini_service = GeminiService()
-        self.cache = CAGCache()
-        self.text_processor = TextProcessor()
+    def __init__(self, rag_system: RAGSystem = None, gemini_service: GeminiService = None,
+                 cache: CAGCache = None, semantic_cache: SemanticCache = None,
+                 text_processor: TextProcessor = None):
+        self.rag_system = rag_system or RAGSystem()
+        self.cache = cache or self.rag_system.cache
+        self.semantic_cache = semantic_cache or SemanticCache(self.rag_system.embedding_generator, self.cache)
+        self.gemini_service = gemini_service or GeminiService(semantic_cache=self.semantic_cache, cache=self.cache)
+        self.text_processor = text_processor or self.rag_system.text_processor
     
-    def retrieve_and_reason(self, query: str, topic: str = None) -> Dict[str, Any]:
+    def retrieve_and_reason(self, query: str, topic: str = None, context: str = None) -> Dict[str, Any]:
         """Retrieve ve Reasoning aşamalarını birleştir"""
-        # 1. Retrieval: İlgili dokümanları al
-        context = self.rag_system.get_context_for_query(query, topic)
+        # 1. Retrieval: İlgili dokümanları al (hazır bağlam verildiyse tekrar arama yapma)
+        source_ids, context_budget = None, None
+        if context is None:
+            context_bundle = self.rag_system.get_context_bundle(query, topic)
+            context, source_ids = context_bundle['context'], context_bundle['source_ids']
+            context_budget = context_bundle['budget']
         
         # 2. Reasoning: Gemini ile analiz yap
         reasoning_prompt = f"""
@@ -47,17 +58,20 @@ class RAREModel:
         return {
             "query": query,
             "retrieved_context": context,
+            "source_ids": source_ids,
+            "context_budget": context_budget,
             "reasoning_analysis": analysis,
             "timestamp": datetime.now().isoformat()
         }
     
-    def predict_exam_questions(self, exam_type: str = "LGS", subject: str = "Din Kültürü", count: int = 10) -> Dict[str, Any]:
-        """Sınav soruları tahmin et"""
+    def predict_exam_questions(self, exam_type: str = "LGS", subject: str = "Din Kültürü", count: int = 10,
+                               for_date: str = None) -> Dict[str, Any]:
+        """Sınav soruları tahmin et (for_date: sonucun cache'leneceği gün, varsayılan bugün)"""
         cache_key = {
             "exam_type": exam_type,
             "subject": subject,
             "count": count,
-            "date": datetime.now().strftime("%Y-%m-%d")
+            "date": for_date or datetime.now().strftime("%Y-%m-%d")
         }
         
         # Cache kontrolü
@@ -71,28 +85,24 @@ class RAREModel:
         # Yüksek olasılıklı konular
         high_prob_topics = curriculum_analysis.get('high_probability_topics', [])
         
-        predicted_questions = []
+        questions_per_topic = count // len(high_prob_topics) if high_prob_topics else count
+        selected_topics = high_prob_topics[:questions_per_topic if high_prob_topics else 1]
         
-        for topic in high_prob_topics[:count//len(high_prob_topics) if high_prob_topics else 1]:
-            # Her konu için RARE pipeline çalıştır
-            rare_result = self.retrieve_and_reason(
-                f"{topic} konusunda {exam_type} sınavında çıkabilecek sorular",
-                topic
-            )
-            
-            # Soru üret
-            questions_data = self.gemini_service.generate_questions_with_reasoning(
-                rare_result['retrieved_context'],
-                topic,
-                count // len(high_prob_topics) if high_prob_topics else count
-            )
-            
-            if 'questions' in questions_data:
-                for question in questions_data['questions']:
-                    question['prediction_confidence'] = rare_result['reasoning_analysis'].get('probability', 0.5)
-                    question['rare_analysis'] = rare_result
-                
-                predicted_questions.extend(questions_data['questions'])
+        # Her konu için RARE pipeline'ını paralel çalıştır; sonuçlar konu sırasıyla birleşir
+        topic_results = map_with_timeout(
+            lambda topic: self._predict_topic_questions(topic, exam_type, questions_per_topic),
+            selected_topics,
+            max_concurrency=settings.TOPIC_CONCURRENCY,
+            timeout=settings.TOPIC_TIMEOUT
+        )
+        
+        predicted_questions = []
+        skipped_topics = []
+        for topic, questions in zip(selected_topics, topic_results):
+            if questions is None:
+                skipped_topics.append(topic)
+                continue
+            predicted_questions.extend(questions)
         
         # Sonuçları güven skoruna göre sırala
         predicted_questions.sort(key=lambda x: x.get('prediction_confidence', 0), reverse=True)
@@ -104,14 +114,97 @@ class RAREModel:
             "total_predicted_questions": len(predicted_questions),
             "questions": predicted_questions[:count],
             "curriculum_analysis": curriculum_analysis,
+            "skipped_topics": skipped_topics,
             "confidence_threshold": settings.PREDICTION_CONFIDENCE_THRESHOLD
         }
         
-        # Cache'le
-        self.cache.cache_response("rare_prediction", cache_key, result)
+        # Cache'le (eksik konulu sonuçlar bir sonraki istekte yeniden denensin)
+        if not skipped_topics:
+            self.cache.cache_response("rare_prediction", cache_key, result)
         
         return result
     
+    def _predict_topic_questions(self, topic: str, exam_type: str, count: int) -> List[Dict[str, Any]]:
+        """Tek bir konu için RARE pipeline'ını çalıştır ve soruları üret"""
+        rare_result = self.retrieve_and_reason(
+            f"{topic} konusunda {exam_type} sınavında çıkabilecek sorular",
+            topic
+        )
+        
+        # Soru üret
+        questions_data = self.gemini_service.generate_questions_with_reasoning(
+            rare_result['retrieved_context'],
+            topic,
+            count,
+            source_ids=rare_result['source_ids']
+        )
+        
+        questions = questions_data.get('questions', []) if isinstance(questions_data, dict) else []
+        for question in questions:
+            self._annotate_question(question, rare_result)
+        
+        return questions
+    
+    def _annotate_question(self, question: Dict[str, Any], rare_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Soruya RARE analizinden gelen tahmin bilgilerini ekle"""
+        question['prediction_confidence'] = rare_result['reasoning_analysis'].get('probability', 0.5)
+        question['rare_analysis'] = rare_result
+        return question
+    
+    def stream_exam_questions(self, exam_type: str = "LGS", subject: str = "Din Kültürü", count: int = 10) -> Iterator[Dict[str, Any]]:
+        """Sınav sorularını üretildikçe akıt
+        
+        Konular paralel işlenir; her soru Gemini çıktısında tamamlandığı anda
+        "question" olayı olarak gönderilir. TOPIC_TIMEOUT boyunca hiçbir konudan
+        olay gelmezse kalan konular atlanır.
+        """
+        curriculum_analysis = self.analyze_curriculum_trends()
+        high_prob_topics = curriculum_analysis.get('high_probability_topics', [])
+        questions_per_topic = count // len(high_prob_topics) if high_prob_topics else count
+        selected_topics = high_prob_topics[:questions_per_topic if high_prob_topics else 1]
+        
+        yield {"event": "topics", "data": {"exam_type": exam_type, "subject": subject, "topics": selected_topics}}
+        
+        events = queue.Queue()
+        
+        def run_topic(topic: str):
+            try:
+                rare_result = self.retrieve_and_reason(
+                    f"{topic} konusunda {exam_type} sınavında çıkabilecek sorular",
+                    topic
+                )
+                for question in self.gemini_service.stream_questions_with_reasoning(
+                    rare_result['retrieved_context'], topic, questions_per_topic,
+                    source_ids=rare_result['source_ids']
+                ):
+                    events.put(("question", topic, self._annotate_question(question, rare_result)))
+            except Exception as e:
+                print(f"Konu akışı hatası ({topic}): {e}")
+            finally:
+                events.put(("topic_done", topic, None))
+        
+        executor = ThreadPoolExecutor(max_workers=max(1, settings.TOPIC_CONCURRENCY), thread_name_prefix="topic-stream")
+        for topic in selected_topics:
+            executor.submit(run_topic, topic)
+        
+        pending_topics = set(selected_topics)
+        emitted = 0
+        try:
+            while pending_topics and emitted < count:
+                try:
+                    kind, topic, question = events.get(timeout=settings.TOPIC_TIMEOUT)
+                except queue.Empty:
+                    break
+                if kind == "topic_done":
+                    pending_topics.discard(topic)
+                    continue
+                emitted += 1
+                yield {"event": "question", "data": question}
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        yield {"event": "done", "data": {"total_predicted_questions": emitted, "skipped_topics": sorted(pending_topics)}}
+    
     def analyze_curriculum_trends(self) -> Dict[str, Any]:
         """Müfredat trendlerini analiz et"""
         # Tüm dokümanlardan trend analizi
@@ -150,26 +243,63 @@ class RAREModel:
             depth = settings.REASONING_DEPTH
         
         reasoning_chain = []
-        current_query = f"{topic} konusunda detaylı analiz"
+        final_insights = None
+        for event in self.iter_deep_reasoning(topic, depth):
+            if event['event'] == 'level':
+                reasoning_chain.append(event['data'])
+            elif event['event'] == 'final_insights':
+                final_insights = event['data']
+        
+        return {
+            "topic": topic,
+            "reasoning_depth": depth,
+            "reasoning_chain": reasoning_chain,
+            "final_insights": final_insights
+        }
+    
+    def iter_deep_reasoning(self, topic: str, depth: int = None) -> Iterator[Dict[str, Any]]:
+        """Derin reasoning seviyelerini hazır oldukça üret (streaming için)
+        
+        Retrieval konu başına bir kez yapılır; sonraki seviyeler aynı doküman
+        kümesini kullanır ve küme yalnızca daha fazla doküman gerektiğinde genişletilir.
+        """
+        if depth is None:
+            depth = settings.REASONING_DEPTH
+        
+        retrieval_query = f"{topic} konusunda detaylı analiz"
+        filters = {'topic': topic} if topic else None
+        retrieved_docs = []
+        fetched_count = 0
+        
+        reasoning_chain = []
+        current_query = retrieval_query
         
         for level in range(depth):
-            rare_result = self.retrieve_and_reason(current_query, topic)
-            reasoning_chain.append({
+            needed = settings.TOP_K_DOCUMENTS + level * settings.REASONING_CONTEXT_STEP
+            
+            # Küme yetersizse ve koleksiyon tükenmediyse genişlet (katlayarak, az sorgu için)
+            if needed > fetched_count and len(retrieved_docs) == fetched_count:
+                fetched_count = max(needed, fetched_count * 2)
+                retrieved_docs = self.rag_system.search_relevant_documents(
+                    retrieval_query, filters, n_results=fetched_count
+                )
+            
+            # Seviye büyüdükçe aday küme genişler ama bağlam CONTEXT_MAX_CHARS içinde kalır
+            context = self.rag_system.build_context_bundle(current_query, retrieved_docs[:needed])['context']
+            rare_result = self.retrieve_and_reason(current_query, topic, context=context)
+            chain_item = {
                 "level": level + 1,
                 "query": current_query,
                 "analysis": rare_result
-            })
+            }
+            reasoning_chain.append(chain_item)
+            yield {"event": "level", "data": chain_item}
             
             # Bir sonraki seviye için query oluştur
             if level < depth - 1:
                 current_query = f"{topic} konusunun daha derin analizi - seviye {level + 2}"
         
-        return {
-            "topic": topic,
-            "reasoning_depth": depth,
-            "reasoning_chain": reasoning_chain,
-            "final_insights": self._extract_final_insights(reasoning_chain)
-        }
+        yield {"event": "final_insights", "data": self._extract_final_insights(reasoning_chain)}
     
     def _extract_final_insights(self, reasoning_chain: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Reasoning zincirinden nihai içgörüleri çıkar"""
@@ -192,4 +322,20 @@ class RAREModel:
         try:
             return json.loads(final_insights)
         except:
-            return {"insights": final_insights}
\ No newline at end of file
+            return {"insights": final_insights}
+    
+    async def retrieve_and_reason_async(self, query: str, topic: str = None) -> Dict[str, Any]:
+        """retrieve_and_reason'ın event loop'u bloklamayan sürümü"""
+        return await run_blocking(self.retrieve_and_reason, query, topic)
+    
+    async def predict_exam_questions_async(self, exam_type: str = "LGS", subject: str = "Din Kültürü", count: int = 10) -> Dict[str, Any]:
+        """predict_exam_questions'ın event loop'u bloklamayan sürümü"""
+        return await run_blocking(self.predict_exam_questions, exam_type, subject, count)
+    
+    async def analyze_curriculum_trends_async(self) -> Dict[str, Any]:
+        """analyze_curriculum_trends'in event loop'u bloklamayan sürümü"""
+        return await run_blocking(self.analyze_curriculum_trends)
+    
+    async def deep_reasoning_async(self, topic: str, depth: int = None) -> Dict[str, Any]:
+        """deep_reasoning'in event loop'u bloklamayan sürümü"""
+        return await run_blocking(self.deep_reasoning, topic, depth)
\ No newline at end of file
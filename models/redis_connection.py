@@ -0,0 +1,189 @@
+import asyncio
+import threading
+import time
+import weakref
+import redis
+import redis.asyncio
+from redis.client import Pipeline
+from redis.asyncio.client import Pipeline as AsyncPipeline
+from typing import Any, Dict
+from config.settings import settings
+
+class CacheUnavailable(redis.ConnectionError):
+    """Devre kesici açıkken Redis'e gitmeden verilen hata"""
+
+class CircuitBreaker:
+    """Redis bağlantı hataları için devre kesici
+    
+    Art arda failure_threshold bağlantı/zaman aşımı hatasından sonra devre açılır
+    ve çağrılar Redis'e gitmeden CacheUnavailable ile reddedilir. reset_timeout
+    sonra tek bir deneme çağrısına izin verilir (yarı açık); başarılı olursa
+    devre kapanır, başarısız olursa yeniden açılır.
+    """
+    
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._rejected = 0
+    
+    @property
+    def is_open(self) -> bool:
+        """Devre açık ve deneme zamanı henüz gelmedi mi (durumu değiştirmez)"""
+        opened_at = self._opened_at
+        return opened_at is not None and time.monotonic() - opened_at < self.reset_timeout
+    
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self._rejected += 1
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                print("Redis devre kesici kapandı")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    print(f"Redis devre kesici açıldı ({self._failures} ardışık hata)")
+                self._opened_at = time.monotonic()
+    
+    def call(self, func, *args, **kwargs):
+        if not self.allow():
+            raise CacheUnavailable("Redis devre kesici açık")
+        try:
+            result = func(*args, **kwargs)
+        except (redis.ConnectionError, redis.TimeoutError):
+            self.record_failure()
+            raise
+        except Exception:
+            # Sunucu yanıt verdi (ör. ResponseError): bağlantı sağlıklı
+            self.record_success()
+            raise
+        self.record_success()
+        return result
+    
+    async def call_async(self, func, *args, **kwargs):
+        if not self.allow():
+            raise CacheUnavailable("Redis devre kesici açık")
+        try:
+            result = await func(*args, **kwargs)
+        except (redis.ConnectionError, redis.TimeoutError):
+            self.record_failure()
+            raise
+        except Exception:
+            # Sunucu yanıt verdi (ör. ResponseError): bağlantı sağlıklı
+            self.record_success()
+            raise
+        self.record_success()
+        return result
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": "closed" if self._opened_at is None else ("open" if self.is_open else "half_open"),
+                "consecutive_failures": self._failures,
+                "rejected_calls": self._rejected
+            }
+
+class _GuardedPipeline(Pipeline):
+    breaker = None
+    
+    def execute(self, raise_on_error=True):
+        return self.breaker.call(super().execute, raise_on_error)
+
+class _GuardedRedis(redis.Redis):
+    """Her komutu (script'ler dahil) ve pipeline'ı devre kesiciden geçiren istemci"""
+    
+    def __init__(self, *args, breaker: CircuitBreaker = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.breaker = breaker
+    
+    def execute_command(self, *args, **options):
+        return self.breaker.call(super().execute_command, *args, **options)
+    
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipe = _GuardedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+        pipe.breaker = self.breaker
+        return pipe
+
+class _GuardedAsyncPipeline(AsyncPipeline):
+    breaker = None
+    
+    async def execute(self, raise_on_error=True):
+        return await self.breaker.call_async(super().execute, raise_on_error)
+
+class _GuardedAsyncRedis(redis.asyncio.Redis):
+    """_GuardedRedis'in asyncio sürümü (aynı devre kesiciyi paylaşır)"""
+    
+    def __init__(self, *args, breaker: CircuitBreaker = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.breaker = breaker
+    
+    async def execute_command(self, *args, **options):
+        return await self.breaker.call_async(super().execute_command, *args, **options)
+    
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipe = _GuardedAsyncPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+        pipe.breaker = self.breaker
+        return pipe
+
+def _pool_options() -> Dict[str, Any]:
+    return {
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_CONNECT_TIMEOUT,
+        "health_check_interval": 30,
+        # Havuz doluysa hata yerine en fazla bu kadar boş bağlantı beklenir
+        "timeout": settings.REDIS_POOL_TIMEOUT
+    }
+
+_breaker = None
+_client = None
+_async_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Süreçteki tüm Redis istemcilerinin paylaştığı devre kesici"""
+    global _breaker
+    if _breaker is None:
+        with _lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(settings.REDIS_BREAKER_FAILURES, settings.REDIS_BREAKER_RESET)
+    return _breaker
+
+def get_redis_client() -> redis.Redis:
+    """Süreç başına tek, sınırlı bağlantı havuzlu senkron istemci"""
+    global _client
+    if _client is None:
+        breaker = get_circuit_breaker()
+        with _lock:
+            if _client is None:
+                pool = redis.BlockingConnectionPool.from_url(settings.REDIS_URL, **_pool_options())
+                _client = _GuardedRedis(connection_pool=pool, breaker=breaker)
+    return _client
+
+def get_async_redis_client() -> redis.asyncio.Redis:
+    """Çalışan event loop'a ait asyncio istemcisi (bağlantılar loop'a bağlıdır)"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        pool = redis.asyncio.BlockingConnectionPool.from_url(settings.REDIS_URL, **_pool_options())
+        client = _GuardedAsyncRedis(connection_pool=pool, breaker=get_circuit_breaker())
+        _async_clients[loop] = client
+    return client
@@ -0,0 +1,190 @@
+import copy
+import json
+import re
+import threading
+import time
+import uuid
+import numpy as np
+from typing import Any, Dict, List, Optional
+from models.cag_cache import CAGCache
+from utils.embeddings import EmbeddingGenerator
+from utils.text_processor import turkish_lower
+from config.settings import settings
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+class SemanticCache:
+    """Neredeyse aynı LLM isteklerine önceki yanıtı döndüren anlamsal cache
+    
+    İstek metni (ör. konu) normalize edilip embedding'e çevrilir ve kayıtlı
+    isteklerle kosinüs benzerliği karşılaştırılır. Soru sayısı/zorluk gibi
+    alanlar birebir eşleşmeli, bağlam doküman kimlikleri ise en az
+    SEMANTIC_CACHE_MIN_SOURCE_OVERLAP oranında örtüşmelidir. Bağlam boşsa
+    (retrieval bir şey bulamadıysa) yalnızca normalize metni aynı olan istek eşleşir.
+    """
+    
+    def __init__(self, embedding_generator: EmbeddingGenerator, cache: CAGCache, namespace: str = "questions"):
+        self.embedding_generator = embedding_generator
+        self.cache = cache
+        self.namespace = namespace
+        self.threshold = settings.SEMANTIC_CACHE_THRESHOLD
+        
+        # İndeks Redis'te tutulur ki tüm worker'lar aynı kayıtları görsün
+        self._meta_key = f"semantic_index:{namespace}:meta"
+        self._vector_key = f"semantic_index:{namespace}:vectors"
+        
+        self._lock = threading.Lock()
+        self._entries = []
+        self._matrix = None
+        self._loaded_at = 0.0
+        self._stats = {"hits": 0, "misses": 0, "stores": 0}
+    
+    def _normalize(self, text: str) -> str:
+        """Büyük/küçük harf (Türkçe uyumlu) ve boşluk farklarını gider"""
+        return _WHITESPACE_PATTERN.sub(' ', turkish_lower(text)).strip()
+    
+    def _embed(self, text: str) -> np.ndarray:
+        """Normalize edilmiş isteğin birim uzunluklu embedding'i"""
+        embedding = self.cache.get_cached_embeddings(text)
+        if embedding is None:
+            embedding = self.embedding_generator.encode(text)[0]
+            self.cache.cache_embeddings(text, embedding)
+        embedding = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+    
+    def _refresh_index(self):
+        """Redis'teki indeksi belirli aralıklarla yerel matrise yükle"""
+        if time.monotonic() - self._loaded_at < settings.SEMANTIC_CACHE_REFRESH:
+            return
+        try:
+            pipe = self.cache.redis_client.pipeline(transaction=False)
+            pipe.hgetall(self._meta_key)
+            pipe.hgetall(self._vector_key)
+            raw_meta, raw_vectors = pipe.execute()
+        except Exception as e:
+            print(f"Semantik cache indeks okuma hatası: {e}")
+            return
+        
+        entries = []
+        for entry_id, meta in raw_meta.items():
+            vector = raw_vectors.get(entry_id)
+            if vector is None:
+                continue
+            entry = json.loads(meta)
+            entry['vector'] = np.frombuffer(vector, dtype=np.float32)
+            entries.append(entry)
+        
+        # En yeni kayıtlar tutulur, fazlası Redis'ten de silinir
+        entries.sort(key=lambda entry: entry['created'], reverse=True)
+        overflow = entries[settings.SEMANTIC_CACHE_MAX_ENTRIES:]
+        entries = entries[:settings.SEMANTIC_CACHE_MAX_ENTRIES]
+        if overflow:
+            try:
+                ids = [entry['id'] for entry in overflow]
+                pipe = self.cache.redis_client.pipeline(transaction=False)
+                pipe.hdel(self._meta_key, *ids)
+                pipe.hdel(self._vector_key, *ids)
+                pipe.execute()
+            except Exception as e:
+                print(f"Semantik cache indeks temizleme hatası: {e}")
+        
+        with self._lock:
+            self._entries = entries
+            self._matrix = np.vstack([entry['vector'] for entry in entries]) if entries else None
+            self._loaded_at = time.monotonic()
+    
+    def _source_overlap(self, left: List[str], right: List[str]) -> float:
+        """İki doküman kimliği kümesinin Jaccard benzerliği"""
+        left, right = set(left), set(right)
+        union = left | right
+        return len(left & right) / len(union) if union else 0.0
+    
+    def _sources_match(self, entry: Dict[str, Any], normalized_text: str, source_ids: List[str]) -> bool:
+        """Kayıt bu isteğin bağlamıyla sunulabilir mi"""
+        if not entry['source_ids'] and not source_ids:
+            # Kısa konu metinleri arasındaki benzerlik tek başına yeterli değil
+            return entry.get('text') == normalized_text
+        return self._source_overlap(entry['source_ids'], source_ids) >= settings.SEMANTIC_CACHE_MIN_SOURCE_OVERLAP
+    
+    def lookup(self, request_text: str, exact_fields: Dict[str, Any],
+               source_ids: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Benzer bir istek için cache'lenmiş yanıtı döndür"""
+        self._refresh_index()
+        with self._lock:
+            entries, matrix = self._entries, self._matrix
+        
+        if matrix is None:
+            self._stats["misses"] += 1
+            return None
+        
+        exact_key = json.dumps(exact_fields, sort_keys=True, ensure_ascii=False)
+        normalized_text = self._normalize(request_text)
+        candidates = [
+            i for i, entry in enumerate(entries)
+            if entry['exact'] == exact_key
+            and self._sources_match(entry, normalized_text, source_ids or [])
+        ]
+        if not candidates:
+            self._stats["misses"] += 1
+            return None
+        
+        query_vector = self._embed(normalized_text)
+        scores = matrix[candidates] @ query_vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            self._stats["misses"] += 1
+            return None
+        
+        cached = self.cache.get_cached_response("semantic", {"namespace": self.namespace, "id": entries[candidates[best]]['id']})
+        if not cached:
+            self._stats["misses"] += 1
+            return None
+        
+        self._stats["hits"] += 1
+        # Çağıranlar yanıtı filtreleyip işaretleyebilir; her isabet kendi kopyasını alır
+        return copy.deepcopy(cached['response'])
+    
+    def store(self, request_text: str, exact_fields: Dict[str, Any],
+              source_ids: Optional[List[str]], response: Dict[str, Any]):
+        """Yanıtı ve isteğin embedding'ini indekse ekle (yanıtın kopyası saklanır)"""
+        response = copy.deepcopy(response)
+        entry_id = uuid.uuid4().hex
+        normalized_text = self._normalize(request_text)
+        vector = self._embed(normalized_text)
+        entry = {
+            "id": entry_id,
+            "text": normalized_text,
+            "exact": json.dumps(exact_fields, sort_keys=True, ensure_ascii=False),
+            "source_ids": sorted(source_ids or []),
+            "created": time.time()
+        }
+        
+        self.cache.cache_response("semantic", {"namespace": self.namespace, "id": entry_id}, response)
+        try:
+            pipe = self.cache.redis_client.pipeline(transaction=False)
+            pipe.hset(self._meta_key, entry_id, json.dumps(entry, ensure_ascii=False))
+            pipe.hset(self._vector_key, entry_id, vector.astype(np.float32).tobytes())
+            pipe.expire(self._meta_key, settings.CACHE_TTL)
+            pipe.expire(self._vector_key, settings.CACHE_TTL)
+            pipe.execute()
+        except Exception as e:
+            print(f"Semantik cache yazma hatası: {e}")
+            return
+        
+        # Yazan worker yeni kaydı hemen görsün
+        entry['vector'] = vector
+        with self._lock:
+            self._entries = [entry] + self._entries
+            self._matrix = vector[np.newaxis, :] if self._matrix is None else np.vstack([vector, self._matrix])
+        self._stats["stores"] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """İsabet/ıskalama sayaçları"""
+        total = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "hit_ratio": self._stats["hits"] / total if total else 0.0,
+            "threshold": self.threshold
+        }
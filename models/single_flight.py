@@ -0,0 +1,163 @@
+import copy
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict
+from models.cag_cache import CAGCache
+from config.settings import settings
+
+# Kira yalnızca sahibi tarafından uzatılır/bırakılır (token karşılaştırmalı)
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class _Flight:
+    """Süreç içinde devam eden tek bir hesaplama"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Aynı anahtar için eşzamanlı hesaplamaları tek bir hesaplamada birleştir
+    
+    Süreç içinde ilk istek lider olur, diğerleri onun sonucunu bekler. Süreçler
+    (worker'lar) arasında lider Redis'te kısa süreli bir kira (SET NX PX) alır ve
+    hesaplama sürerken kirayı yeniler; sonucu kısa ömürlü bir anahtara yazar.
+    Kirayı alamayan worker'lar bu anahtarı yoklar; kira sonuçsuz biterse
+    liderliği devralmayı dener. Redis'e ulaşılamazsa yalnızca süreç içi
+    birleştirme yapılır.
+    """
+    
+    def __init__(self, cache: CAGCache, prefix: str = "single_flight"):
+        self.cache = cache
+        self.prefix = prefix
+        self.lease_ttl = settings.SINGLE_FLIGHT_LEASE_TTL
+        self.result_ttl = settings.SINGLE_FLIGHT_RESULT_TTL
+        self.wait_timeout = settings.SINGLE_FLIGHT_WAIT_TIMEOUT
+        self.poll_interval = settings.SINGLE_FLIGHT_POLL_INTERVAL
+        
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "local_followers": 0, "remote_followers": 0, "fallbacks": 0}
+        self._renew_script = self.cache.redis_client.register_script(_RENEW_SCRIPT)
+        self._release_script = self.cache.redis_client.register_script(_RELEASE_SCRIPT)
+    
+    def do(self, key_data: Dict[str, Any], compute: Callable[[], Any]) -> Any:
+        """key_data için compute'u en fazla bir kez çalıştır, sonucu tüm bekleyenlere dağıt"""
+        key = self.cache.response_key(self.prefix, key_data)
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        
+        if not leader:
+            self._count("local_followers")
+            if not flight.done.wait(self.wait_timeout):
+                self._count("fallbacks")
+                return compute()
+            if flight.error is not None:
+                raise flight.error
+            # Lider sonucu kendi çağıranına döndürür; takipçiler ayrı kopya alır
+            return copy.deepcopy(flight.result)
+        
+        try:
+            flight.result = self._do_distributed(key, key_data, compute)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+    
+    def _do_distributed(self, key: str, key_data: Dict[str, Any], compute: Callable[[], Any]) -> Any:
+        """Worker'lar arası kira ile liderlik; kira alınamazsa liderin sonucunu bekle"""
+        lease_key = f"{key}:lease"
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+        
+        while True:
+            # Az önce biten bir hesaplamanın sonucu hâlâ duruyorsa onu kullan
+            finished = self.cache.get_cached_response(self.prefix, key_data)
+            if finished:
+                if waited:
+                    self._count("remote_followers")
+                return finished['response']
+            
+            token = uuid.uuid4().hex
+            try:
+                acquired = self.cache.redis_client.set(lease_key, token, nx=True, px=int(self.lease_ttl * 1000))
+            except Exception as e:
+                print(f"Single-flight kira hatası: {e}")
+                self._count("leaders")
+                return compute()
+            
+            if acquired:
+                self._count("leaders")
+                return self._lead(lease_key, token, key_data, compute)
+            
+            waited = True
+            # Kira sahibinin bitirmesini (veya kiranın düşmesini) bekle
+            while self._lease_alive(lease_key) and time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                finished = self.cache.get_cached_response(self.prefix, key_data)
+                if finished:
+                    self._count("remote_followers")
+                    return finished['response']
+            
+            if time.monotonic() >= deadline:
+                self._count("fallbacks")
+                return compute()
+    
+    def _lease_alive(self, lease_key: str) -> bool:
+        try:
+            return bool(self.cache.redis_client.exists(lease_key))
+        except Exception:
+            return False
+    
+    def _lead(self, lease_key: str, token: str, key_data: Dict[str, Any], compute: Callable[[], Any]) -> Any:
+        """Kirayı yenileyerek hesapla, sonucu yayınla ve kirayı bırak"""
+        stop_renewal = threading.Event()
+        
+        def renew():
+            while not stop_renewal.wait(self.lease_ttl / 3):
+                try:
+                    self._renew_script(keys=[lease_key], args=[token, int(self.lease_ttl * 1000)])
+                except Exception as e:
+                    print(f"Single-flight kira yenileme hatası: {e}")
+        
+        renewer = threading.Thread(target=renew, daemon=True)
+        renewer.start()
+        try:
+            result = compute()
+            # Diğer worker'lar sonucu kısa ömürlü anahtardan okur
+            self.cache.cache_response(self.prefix, key_data, result, ttl=self.result_ttl)
+            return result
+        finally:
+            stop_renewal.set()
+            try:
+                self._release_script(keys=[lease_key], args=[token])
+            except Exception as e:
+                print(f"Single-flight kira bırakma hatası: {e}")
+    
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Liderlik/bekleme sayaçları ve devam eden hesaplama sayısı"""
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._flights)}
@@ -0,0 +1,356 @@
+import json
+import os
+import tempfile
+import threading
+import chromadb
+import numpy as np
+from contextlib import contextmanager
+from chromadb.config import Settings as ChromaSettings
+from typing import Any, Dict, List, Optional
+from config.settings import settings
+
+try:
+    import fcntl
+except ImportError:  # fcntl yoksa (Windows) yalnızca süreç içi kilit kullanılır
+    fcntl = None
+
+COLLECTION_NAME = "din_kulturu_curriculum"
+
+@contextmanager
+def _file_lock(lock_file: str, exclusive: bool):
+    """Süreçler arası flock (yazarlar özel, okuyucular paylaşımlı kilit alır)"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(lock_file), exist_ok=True)
+    with open(lock_file, 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+class VectorStore:
+    """Retrieval arka uçlarının ortak arayüzü"""
+    
+    def count(self) -> int:
+        """Kayıtlı doküman sayısı"""
+        raise NotImplementedError
+    
+    def all_ids(self) -> List[str]:
+        """Kayıtlı tüm doküman kimlikleri"""
+        raise NotImplementedError
+    
+    def get_fingerprints(self, ids: List[str]) -> Dict[str, Optional[str]]:
+        """Verilen kimliklerden kayıtlı olanların metadata parmak izleri"""
+        raise NotImplementedError
+    
+    def add(self, ids: List[str], embeddings: List[Any], documents: List[str], metadatas: List[Dict[str, Any]]):
+        """Dokümanları embedding'leriyle ekle"""
+        raise NotImplementedError
+    
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Var olan dokümanların metadata'sını güncelle"""
+        raise NotImplementedError
+    
+    def delete(self, ids: List[str]):
+        """Dokümanları sil"""
+        raise NotImplementedError
+    
+    def attach_snapshot(self, snapshot) -> bool:
+        """Önceden hesaplanmış bir EmbeddingSnapshot'ı kopyalamadan kullan (destekleniyorsa)"""
+        return False
+    
+    def query(self, query_embeddings: List[Any], n_results: int,
+              where: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """Her sorgu embedding'i için en yakın dokümanları döndür
+        
+        Sonuç öğeleri: {'id', 'content', 'metadata', 'distance'}
+        """
+        raise NotImplementedError
+
+class ChromaVectorStore(VectorStore):
+    """ChromaDB (SQLite + HNSW) tabanlı arka uç; büyük derlemler için"""
+    
+    def __init__(self, path: str = None):
+        # ChromaDB istemcisini başlat
+        self.chroma_client = chromadb.PersistentClient(
+            path=path or settings.CHROMA_DB_PATH,
+            settings=ChromaSettings(anonymized_telemetry=False)
+        )
+        
+        # Koleksiyon oluştur veya al
+        try:
+            self.collection = self.chroma_client.get_collection(COLLECTION_NAME)
+        except:
+            self.collection = self.chroma_client.create_collection(
+                name=COLLECTION_NAME,
+                metadata={"description": "LGS Din Kültürü Müfredatı"}
+            )
+    
+    def count(self) -> int:
+        return self.collection.count()
+    
+    def all_ids(self) -> List[str]:
+        return self.collection.get(include=[])['ids']
+    
+    def get_fingerprints(self, ids: List[str]) -> Dict[str, Optional[str]]:
+        existing = self.collection.get(ids=list(ids), include=["metadatas"])
+        return {
+            doc_id: (metadata or {}).get('fingerprint')
+            for doc_id, metadata in zip(existing['ids'], existing['metadatas'])
+        }
+    
+    def add(self, ids, embeddings, documents, metadatas):
+        self.collection.add(
+            documents=documents,
+            embeddings=[np.asarray(embedding).tolist() for embedding in embeddings],
+            metadatas=metadatas,
+            ids=ids
+        )
+    
+    def update_metadatas(self, ids, metadatas):
+        self.collection.update(ids=ids, metadatas=metadatas)
+    
+    def delete(self, ids):
+        self.collection.delete(ids=list(ids))
+    
+    def query(self, query_embeddings, n_results, where=None):
+        results = self.collection.query(
+            query_embeddings=[np.asarray(embedding).tolist() for embedding in query_embeddings],
+            n_results=n_results,
+            where=where if where else None
+        )
+        
+        # Sonuçları düzenle
+        grouped = []
+        for q in range(len(results['ids'])):
+            documents = []
+            for i in range(len(results['documents'][q])):
+                documents.append({
+                    'content': results['documents'][q][i],
+                    'metadata': results['metadatas'][q][i],
+                    'distance': results['distances'][q][i] if results.get('distances') else 0,
+                    'id': results['ids'][q][i]
+                })
+            grouped.append(documents)
+        return grouped
+
+class LocalVectorStore(VectorStore):
+    """Süreç içi numpy arka ucu; küçük ve çoğunlukla okunan derlemler için
+    
+    Normalize edilmiş float32 matris `embeddings.npy` olarak saklanır ve salt
+    okunur memory-map ile açılır. topic/subtopic/difficulty sütunları ayrıca
+    tutulur, filtreler aramadan önce uygulanır. Mesafe kosinüs mesafesidir (1 - cos).
+    
+    Birden fazla worker aynı dizini paylaşabilir: yazmalar dosya kilidi
+    altında, diğer worker'ların son yazdıkları üzerine yapılır; okuyucular
+    matris ve kayıt dosyasını hep aynı yazmadan görür.
+    """
+    
+    FILTER_COLUMNS = ("topic", "subtopic", "difficulty")
+    
+    def __init__(self, path: str = None):
+        self.path = path or settings.LOCAL_INDEX_PATH
+        self._matrix_file = os.path.join(self.path, "embeddings.npy")
+        self._records_file = os.path.join(self.path, "documents.json")
+        self._lock_file = os.path.join(self.path, ".lock")
+        self._lock = threading.Lock()
+        self._state = None
+        self._disk_version = None  # Son okunan/yazılan kayıt dosyasının (mtime, boyut) bilgisi
+        if os.path.isdir(self.path):
+            with _file_lock(self._lock_file, exclusive=False):
+                self._load()
+        else:
+            self._load()
+    
+    def _read_disk_version(self):
+        try:
+            stat = os.stat(self._records_file)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _load(self):
+        """Diskteki indeksi memory-map ile aç (çağıran dosya kilidini tutar)"""
+        self._disk_version = self._read_disk_version()
+        if not (os.path.exists(self._matrix_file) and os.path.exists(self._records_file)):
+            self._set_state(None, [], [], [])
+            return
+        with open(self._records_file, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        matrix = np.load(self._matrix_file, mmap_mode='r')
+        self._set_state(matrix, records['ids'], records['documents'], records['metadatas'])
+    
+    @contextmanager
+    def _writing(self):
+        """Yazma kilidini al; başka bir worker diske yazdıysa önce onu yükle
+        
+        Snapshot bağlıyken disk değişmemişse bellekteki durum korunur.
+        """
+        with self._lock, _file_lock(self._lock_file, exclusive=True):
+            if self._read_disk_version() != self._disk_version:
+                self._load()
+            yield self._state
+    
+    def _set_state(self, matrix, ids, documents, metadatas):
+        # Okuyucular tutarlı bir görüntü görsün diye durum tek atamayla değiştirilir
+        metadatas = list(metadatas)
+        self._state = {
+            "matrix": matrix,
+            "ids": list(ids),
+            "documents": list(documents),
+            "metadatas": metadatas,
+            "positions": {doc_id: i for i, doc_id in enumerate(ids)},
+            "columns": {
+                column: np.array([(metadata or {}).get(column, '') for metadata in metadatas], dtype=object)
+                for column in self.FILTER_COLUMNS
+            }
+        }
+    
+    def _persist(self, matrix, ids, documents, metadatas):
+        """Yeni durumu atomik olarak diske yaz ve memory-map ile yeniden aç (yazma kilidi altında)"""
+        os.makedirs(self.path, exist_ok=True)
+        # Süreç başına benzersiz geçici dosyalar: eşzamanlı yazarlar birbirinin dosyasını taşımaz
+        matrix_fd, matrix_tmp = tempfile.mkstemp(dir=self.path, prefix=".embeddings-", suffix=".npy")
+        records_fd, records_tmp = tempfile.mkstemp(dir=self.path, prefix=".documents-", suffix=".json")
+        try:
+            with os.fdopen(matrix_fd, 'wb') as f:
+                np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+            with os.fdopen(records_fd, 'w', encoding='utf-8') as f:
+                json.dump({"ids": ids, "documents": documents, "metadatas": metadatas}, f, ensure_ascii=False)
+            os.replace(matrix_tmp, self._matrix_file)
+            os.replace(records_tmp, self._records_file)
+        finally:
+            for tmp_path in (matrix_tmp, records_tmp):
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        self._load()
+    
+    def _normalize(self, embeddings) -> np.ndarray:
+        matrix = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+    
+    def attach_snapshot(self, snapshot) -> bool:
+        """Snapshot matrisini doğrudan kullan; worker'lar aynı sayfa önbelleğini paylaşır"""
+        with self._lock:
+            if self._state["ids"] == snapshot.ids:
+                return True
+            self._set_state(snapshot.matrix, snapshot.ids, snapshot.documents, snapshot.metadatas)
+            return True
+    
+    def count(self) -> int:
+        return len(self._state["ids"])
+    
+    def all_ids(self) -> List[str]:
+        return list(self._state["ids"])
+    
+    def get_fingerprints(self, ids):
+        state = self._state
+        return {
+            doc_id: (state["metadatas"][state["positions"][doc_id]] or {}).get('fingerprint')
+            for doc_id in ids if doc_id in state["positions"]
+        }
+    
+    def add(self, ids, embeddings, documents, metadatas):
+        if not ids:
+            return
+        with self._writing() as state:
+            # Aynı dokümanları başka bir worker az önce eklemiş olabilir
+            new = [i for i, doc_id in enumerate(ids) if doc_id not in state["positions"]]
+            if not new:
+                return
+            new_rows = self._normalize(embeddings)[new]
+            matrix = new_rows if state["matrix"] is None else np.vstack([state["matrix"], new_rows])
+            self._persist(
+                matrix,
+                state["ids"] + [ids[i] for i in new],
+                state["documents"] + [documents[i] for i in new],
+                state["metadatas"] + [metadatas[i] for i in new]
+            )
+    
+    def update_metadatas(self, ids, metadatas):
+        with self._writing() as state:
+            updated = list(state["metadatas"])
+            for doc_id, metadata in zip(ids, metadatas):
+                if doc_id in state["positions"]:
+                    updated[state["positions"][doc_id]] = metadata
+            self._persist(state["matrix"], state["ids"], state["documents"], updated)
+    
+    def delete(self, ids):
+        removed = set(ids)
+        with self._writing() as state:
+            if not removed or state["matrix"] is None:
+                return
+            keep = [i for i, doc_id in enumerate(state["ids"]) if doc_id not in removed]
+            if len(keep) == len(state["ids"]):
+                return
+            if not keep:
+                for file_path in (self._matrix_file, self._records_file):
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
+                self._set_state(None, [], [], [])
+                self._disk_version = None
+                return
+            self._persist(
+                np.asarray(state["matrix"])[keep],
+                [state["ids"][i] for i in keep],
+                [state["documents"][i] for i in keep],
+                [state["metadatas"][i] for i in keep]
+            )
+    
+    def _candidate_rows(self, state: Dict[str, Any], where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Filtreye uyan satırlar (filtre yoksa None = tüm satırlar)"""
+        if not where:
+            return None
+        mask = np.ones(len(state["ids"]), dtype=bool)
+        for key, value in where.items():
+            if key in state["columns"]:
+                mask &= state["columns"][key] == value
+            else:
+                mask &= np.array([(metadata or {}).get(key) == value for metadata in state["metadatas"]], dtype=bool)
+        return np.flatnonzero(mask)
+    
+    def query(self, query_embeddings, n_results, where=None):
+        state = self._state
+        if state["matrix"] is None or not state["ids"]:
+            return [[] for _ in query_embeddings]
+        
+        rows = self._candidate_rows(state, where)
+        candidates = state["matrix"] if rows is None else state["matrix"][rows]
+        if len(candidates) == 0:
+            return [[] for _ in query_embeddings]
+        
+        scores = self._normalize(query_embeddings) @ candidates.T
+        k = min(n_results, scores.shape[1])
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(k), (scores.shape[0], 1))
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        
+        grouped = []
+        for row_scores, row_top in zip(scores, top):
+            documents = []
+            for candidate in row_top:
+                position = int(candidate if rows is None else rows[candidate])
+                documents.append({
+                    'content': state["documents"][position],
+                    'metadata': dict(state["metadatas"][position] or {}),
+                    'distance': float(1.0 - row_scores[candidate]),
+                    'id': state["ids"][position]
+                })
+            grouped.append(documents)
+        return grouped
+
+def create_vector_store(backend: str = None) -> VectorStore:
+    """Settings.RETRIEVAL_BACKEND'e göre retrieval arka ucunu oluştur"""
+    backend = (backend or settings.RETRIEVAL_BACKEND).lower()
+    if backend == "local":
+        return LocalVectorStore()
+    if backend == "chroma":
+        return ChromaVectorStore()
+    raise ValueError(f"Bilinmeyen retrieval backend: {backend}")
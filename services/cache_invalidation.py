@@ -0,0 +1,71 @@
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from models.cag_cache import CAGCache
+from config.settings import settings
+
+class CacheClearJobs:
+    """Desen bazlı cache temizliğini arka plan işi olarak çalıştırıp ilerlemesini tutan yönetici
+    
+    Aynı desen için çalışan bir iş varsa yenisi başlatılmaz, mevcut iş döner.
+    Yalnızca son CACHE_CLEAR_MAX_JOBS işin durumu saklanır.
+    """
+    
+    def __init__(self, cache: CAGCache):
+        self.cache = cache
+        self._jobs = OrderedDict()  # job_id -> iş durumu
+        self._lock = threading.Lock()
+    
+    def start(self, pattern: str = "*") -> Dict[str, Any]:
+        """Temizleme işini başlat ve ilk durumunu döndür"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job['pattern'] == pattern and job['status'] in ("queued", "running"):
+                    return dict(job)
+            
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "pattern": pattern,
+                "status": "queued",
+                "scanned": 0,
+                "deleted": 0,
+                "started_at": datetime.now().isoformat(),
+                "finished_at": None,
+                "error": None
+            }
+            self._jobs[job['job_id']] = job
+            self._trim()
+        
+        threading.Thread(target=self._run, args=(job,), name="cache-clear", daemon=True).start()
+        return dict(job)
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+    
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(job) for job in self._jobs.values()]
+    
+    def _run(self, job: Dict[str, Any]):
+        self._update(job, status="running")
+        try:
+            for scanned, deleted in self.cache.iter_clear(job['pattern']):
+                self._update(job, scanned=scanned, deleted=deleted)
+            self._update(job, status="completed", finished_at=datetime.now().isoformat())
+        except Exception as e:
+            print(f"Cache temizleme hatası: {e}")
+            self._update(job, status="failed", error=str(e), finished_at=datetime.now().isoformat())
+    
+    def _update(self, job: Dict[str, Any], **fields):
+        with self._lock:
+            job.update(fields)
+    
+    def _trim(self):
+        """Limit aşılırsa en eski bitmiş işleri at"""
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in ("completed", "failed")]
+        for job_id in finished[:max(0, len(self._jobs) - settings.CACHE_CLEAR_MAX_JOBS)]:
+            del self._jobs[job_id]
@@ -0,0 +1,167 @@
+import threading
+from typing import Optional
+from models.cag_cache import CAGCache
+from utils.text_processor import TextProcessor
+from utils.embeddings import EmbeddingGenerator
+from models.rag_system import RAGSystem
+from models.semantic_cache import SemanticCache
+from services.gemini_service import GeminiService
+from models.rare_model import RAREModel
+from data.curriculum_loader import CurriculumLoader
+from services.prediction_service import PredictionService
+from services.prewarm_scheduler import PrewarmScheduler
+from services.cache_invalidation import CacheClearJobs
+
+class ServiceContainer:
+    """Ağır bileşenleri süreç başına bir kez oluşturup paylaşan bağımlılık kabı
+    
+    Her bileşen ilk erişimde oluşturulur. warm_up() (tercihen arka planda)
+    tüm grafiği kurar, müfredatı yükler ve embedding modelini ısıtır;
+    bitene kadar `ready` False döner.
+    """
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Hafif bileşenler (cache, müfredat, zamanlayıcılar) ayrı kilitle kurulur; ısınma
+        # büyük kilidi tutarken de erişilebilirler. Sıra her zaman _lock -> _light_lock'tur,
+        # _light_lock tutulurken _lock alınmaz.
+        self._light_lock = threading.Lock()
+        self._cache = None
+        self._text_processor = None
+        self._embedding_generator = None
+        self._rag_system = None
+        self._semantic_cache = None
+        self._gemini_service = None
+        self._rare_model = None
+        self._curriculum_loader = None
+        self._prediction_service = None
+        self._prewarm_scheduler = None
+        self._cache_clear_jobs = None
+        
+        self._ready = threading.Event()
+        self._warm_up_thread = None
+        self.startup_error: Optional[str] = None
+    
+    @property
+    def cache(self) -> CAGCache:
+        with self._light_lock:
+            if self._cache is None:
+                self._cache = CAGCache()
+            return self._cache
+    
+    @property
+    def text_processor(self) -> TextProcessor:
+        with self._light_lock:
+            if self._text_processor is None:
+                self._text_processor = TextProcessor()
+            return self._text_processor
+    
+    @property
+    def embedding_generator(self) -> EmbeddingGenerator:
+        with self._lock:
+            if self._embedding_generator is None:
+                self._embedding_generator = EmbeddingGenerator()
+            return self._embedding_generator
+    
+    @property
+    def rag_system(self) -> RAGSystem:
+        with self._lock:
+            if self._rag_system is None:
+                self._rag_system = RAGSystem(
+                    embedding_generator=self.embedding_generator,
+                    text_processor=self.text_processor,
+                    cache=self.cache
+                )
+            return self._rag_system
+    
+    @property
+    def semantic_cache(self) -> SemanticCache:
+        with self._lock:
+            if self._semantic_cache is None:
+                self._semantic_cache = SemanticCache(self.embedding_generator, self.cache)
+            return self._semantic_cache
+    
+    @property
+    def gemini_service(self) -> GeminiService:
+        with self._lock:
+            if self._gemini_service is None:
+                self._gemini_service = GeminiService(semantic_cache=self.semantic_cache, cache=self.cache)
+            return self._gemini_service
+    
+    @property
+    def rare_model(self) -> RAREModel:
+        with self._lock:
+            if self._rare_model is None:
+                self._rare_model = RAREModel(
+                    rag_system=self.rag_system,
+                    gemini_service=self.gemini_service,
+                    cache=self.cache,
+                    semantic_cache=self.semantic_cache,
+                    text_processor=self.text_processor
+                )
+            return self._rare_model
+    
+    @property
+    def curriculum_loader(self) -> CurriculumLoader:
+        text_processor = self.text_processor
+        with self._light_lock:
+            if self._curriculum_loader is None:
+                self._curriculum_loader = CurriculumLoader(text_processor)
+            return self._curriculum_loader
+    
+    @property
+    def prediction_service(self) -> PredictionService:
+        with self._lock:
+            if self._prediction_service is None:
+                self._prediction_service = PredictionService(
+                    rare_model=self.rare_model,
+                    curriculum_loader=self.curriculum_loader,
+                    cache=self.cache
+                )
+            return self._prediction_service
+    
+    @property
+    def prewarm_scheduler(self) -> PrewarmScheduler:
+        cache = self.cache
+        with self._light_lock:
+            if self._prewarm_scheduler is None:
+                self._prewarm_scheduler = PrewarmScheduler(lambda: self.prediction_service, cache)
+            return self._prewarm_scheduler
+    
+    @property
+    def cache_clear_jobs(self) -> CacheClearJobs:
+        cache = self.cache
+        with self._light_lock:
+            if self._cache_clear_jobs is None:
+                self._cache_clear_jobs = CacheClearJobs(cache)
+            return self._cache_clear_jobs
+    
+    @property
+    def ready(self) -> bool:
+        """Servis grafiği kuruldu ve model ısındı mı"""
+        return self._ready.is_set()
+    
+    def warm_up(self):
+        """Tüm grafiği kur, müfredatı yükle ve embedding modelini ısıt"""
+        try:
+            self.prediction_service
+            self.embedding_generator.warm_up()
+            self._ready.set()
+        except Exception as e:
+            self.startup_error = str(e)
+            print(f"Servis başlatma hatası: {e}")
+    
+    def start_background_warm_up(self):
+        """warm_up'ı arka plan thread'inde başlat (bir kez)"""
+        with self._light_lock:
+            if self._warm_up_thread is None:
+                self._warm_up_thread = threading.Thread(
+                    target=self.warm_up, name="service-warm-up", daemon=True
+                )
+                self._warm_up_thread.start()
+    
+    def wait_until_ready(self, timeout: float = None) -> bool:
+        """Hazır olana kadar bekle"""
+        return self._ready.wait(timeout)
+
+container = ServiceContainer()
@@ -1,17 +1,22 @@
 import google.generativeai as genai
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Iterator
 from config.settings import settings
 from models.cag_cache import CAGCache
+from utils.concurrency import run_blocking
+from utils.json_stream import JSONArrayStreamParser
 import json
+import copy
 
 class GeminiService:
-    def __init__(self):
+    def __init__(self, semantic_cache=None, cache: CAGCache = None):
         if not settings.GOOGLE_API_KEY:
             raise ValueError("GOOGLE_API_KEY environment variable is required")
         
         genai.configure(api_key=settings.GOOGLE_API_KEY)
         self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
-        self.cache = CAGCache()
+        self.cache = cache or CAGCache()
+        # Benzer soru üretim isteklerini yanıtlayan isteğe bağlı katman (SemanticCache)
+        self.semantic_cache = semantic_cache if settings.SEMANTIC_CACHE_ENABLED else None
     
     def generate_response(self, prompt: str, use_cache: bool = True) -> str:
         """Gemini'den yanıt al"""
@@ -37,6 +42,35 @@ class GeminiService:
             print(f"Gemini API hatası: {e}")
             return "Üzgünüm, şu anda yanıt üretemiyorum."
     
+    def stream_response(self, prompt: str, use_cache: bool = True) -> Iterator[str]:
+        """Gemini yanıtını parça parça üret; tamamlanan yanıt cache'lenir"""
+        cache_key = {"prompt": prompt, "model": settings.GEMINI_MODEL}
+        
+        # Cache kontrolü
+        if use_cache:
+            cached_response = self.cache.get_cached_response("gemini", cache_key)
+            if cached_response:
+                yield cached_response['response']['text']
+                return
+        
+        chunks = []
+        try:
+            for chunk in self.model.generate_content(prompt, stream=True):
+                chunk_text = chunk.text
+                chunks.append(chunk_text)
+                yield chunk_text
+        except Exception as e:
+            print(f"Gemini API hatası: {e}")
+            return
+        
+        # Cache'le (yalnızca eksiksiz yanıtlar)
+        if use_cache:
+            self.cache.cache_response("gemini", cache_key, {"text": "".join(chunks)})
+    
+    async def generate_response_async(self, prompt: str, use_cache: bool = True) -> str:
+        """generate_response'un event loop'u bloklamayan sürümü"""
+        return await run_blocking(self.generate_response, prompt, use_cache)
+    
     def analyze_curriculum_pattern(self, curriculum_data: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Müfredat desenlerini analiz et"""
         prompt = f"""
@@ -66,9 +100,53 @@ class GeminiService:
         except:
             return {"error": "Analiz yanıtı parse edilemedi", "raw_response": response}
     
-    def generate_questions_with_reasoning(self, context: str, topic: str, count: int = 5) -> List[Dict[str, Any]]:
+    def generate_questions_with_reasoning(self, context: str, topic: str, count: int = 5,
+                                          source_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """Reasoning ile soru üret"""
-        prompt = f"""
+        use_semantic = self.semantic_cache is not None and source_ids is not None
+        if use_semantic:
+            cached = self.semantic_cache.lookup(topic, {"count": count}, source_ids)
+            if cached:
+                return cached
+        
+        prompt = self._build_questions_prompt(context, topic, count)
+        
+        response = self.generate_response(prompt)
+        try:
+            result = json.loads(response)
+        except:
+            return {"error": "Soru üretimi başarısız", "raw_response": response}
+        
+        if use_semantic and result.get('questions'):
+            self.semantic_cache.store(topic, {"count": count}, source_ids, result)
+        return result
+    
+    def stream_questions_with_reasoning(self, context: str, topic: str, count: int = 5,
+                                        source_ids: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Soruları Gemini çıktısında tamamlandıkça tek tek üret"""
+        use_semantic = self.semantic_cache is not None and source_ids is not None
+        if use_semantic:
+            cached = self.semantic_cache.lookup(topic, {"count": count}, source_ids)
+            if cached:
+                yield from cached.get('questions', [])
+                return
+        
+        prompt = self._build_questions_prompt(context, topic, count)
+        parser = JSONArrayStreamParser("questions")
+        
+        questions = []
+        for chunk in self.stream_response(prompt):
+            for question in parser.feed(chunk):
+                # Tüketici soruyu işaretleyebilir; cache'e değişmemiş kopyası yazılır
+                questions.append(copy.deepcopy(question))
+                yield question
+        
+        if use_semantic and parser.finished and questions:
+            self.semantic_cache.store(topic, {"count": count}, source_ids, {"questions": questions})
+    
+    def _build_questions_prompt(self, context: str, topic: str, count: int) -> str:
+        """Soru üretim prompt'unu oluştur"""
+        return f"""
         Sen LGS Din Kültürü uzmanısın. Aşağıdaki bağlamı kullanarak {topic} konusunda {count} adet soru üret.
         
         Bağlam:
@@ -101,9 +179,8 @@ class GeminiService:
             ]
         }}
         """
-        
-        response = self.generate_response(prompt)
-        try:
-            return json.loads(response)
-        except:
-            return {"error": "Soru üretimi başarısız", "raw_response": response}
\ No newline at end of file
+    
+    async def generate_questions_with_reasoning_async(self, context: str, topic: str, count: int = 5,
+                                                      source_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """generate_questions_with_reasoning'in event loop'u bloklamayan sürümü"""
+        return await run_blocking(self.generate_questions_with_reasoning, context, topic, count, source_ids)
\ No newline at end of file
@@ -1,49 +1,118 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Iterator
 from models.rare_model import RAREModel
 from data.curriculum_loader import CurriculumLoader
 from models.cag_cache import CAGCache
+from models.embedding_snapshot import load_embedding_snapshot
+from models.single_flight import SingleFlight
+from config.settings import settings
+from utils.concurrency import run_blocking
+import asyncio
+import copy
 import json
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 
 class PredictionService:
-    def __init__(self):
-        self.rare_model = RAREModel()
-        self.curriculum_loader = CurriculumLoader()
-        self.cache = CAGCache()
+    def __init__(self, rare_model: RAREModel = None, curriculum_loader: CurriculumLoader = None,
+                 cache: CAGCache = None, single_flight: SingleFlight = None):
+        self.rare_model = rare_model or RAREModel()
+        self.curriculum_loader = curriculum_loader or CurriculumLoader(self.rare_model.text_processor)
+        self.cache = cache or self.rare_model.cache
+        # Aynı parametreli eşzamanlı tahminler tek RARE hesaplamasında birleşir
+        self.single_flight = single_flight or SingleFlight(self.cache, prefix="prediction_flight")
+        # Arka planda yenilenmekte olan tahmin anahtarları (aynı anahtar için tek yenileme)
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        # Async katmanda devam eden tahminler (anahtar -> asyncio.Task); takipçiler thread tutmaz
+        self._async_flights = {}
         
         # Müfredatı yükle
         self._load_curriculum()
     
     def _load_curriculum(self):
         """Müfredatı RAG sistemine yükle"""
-        curriculum_data = self.curriculum_loader.load_din_kulturu_curriculum()
-        self.rare_model.rag_system.add_documents(curriculum_data)
+        rag_system = self.rare_model.rag_system
+        # Yükleyici ile indeks arasında parçalama aşaması
+        curriculum_chunks = rag_system.chunk_documents(list(self.curriculum_loader.get_snapshot().documents))
+        # Çevrimdışı üretilmiş embedding snapshot'ı varsa model çağrısı gerekmez
+        snapshot = load_embedding_snapshot()
+        # İçerik tabanlı kimliklerle eşitle: yeniden başlatmada koleksiyon büyümez
+        rag_system.sync_documents(curriculum_chunks, snapshot=snapshot)
     
     def predict_next_exam_questions(self, 
                                   exam_date: str = None, 
                                   question_count: int = 20,
                                   difficulty_filter: str = None,
                                   topic_filter: str = None) -> Dict[str, Any]:
-        """Bir sonraki sınav için soru tahmini yap"""
+        """Bir sonraki sınav için soru tahmini yap
         
-        cache_key = {
-            "exam_date": exam_date,
-            "question_count": question_count, 
-            "difficulty_filter": difficulty_filter,
-            "topic_filter": topic_filter,
-            "prediction_date": datetime.now().strftime("%Y-%m-%d")
-        }
+        Bugünün sonucu yoksa önceki günün sonucu (stale) hemen döner ve
+        güncel tahmin arka planda hesaplanır.
+        """
+        cache_key = self._prediction_cache_key(exam_date, question_count, difficulty_filter, topic_filter)
+        self._record_popularity(cache_key)
+        
+        # Cache kontrolü (taze sonuç veya yenilenirken sunulacak eski sonuç)
+        cached_result = self._get_cached_prediction(cache_key)
+        if cached_result:
+            return cached_result
         
-        # Cache kontrolü
+        return self._coalesced_prediction(cache_key)
+    
+    def _get_cached_prediction(self, cache_key: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Günün sonucunu, yoksa yenilemeyi başlatıp son bilinen sonucu döndür"""
         cached_result = self.cache.get_cached_response("prediction_service", cache_key)
         if cached_result:
             return cached_result['response']
         
+        if not settings.PREDICTION_STALE_WHILE_REVALIDATE:
+            return None
+        stale_result = self.cache.get_cached_response("prediction_latest", self._latest_cache_key(cache_key))
+        if stale_result:
+            self._schedule_refresh(cache_key)
+            return stale_result['response']
+        return None
+    
+    def _coalesced_prediction(self, cache_key: Dict[str, Any]) -> Dict[str, Any]:
+        """Tahmini hesapla; eşzamanlı aynı istekler tek hesaplamada birleşir"""
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return self._compute_prediction(cache_key)
+        
+        # Iskalamada yalnızca bir istek (tüm worker'lar arasında) hesaplar, diğerleri sonucu bekler
+        return self.single_flight.do(cache_key, lambda: self._compute_prediction(cache_key))
+    
+    def _schedule_refresh(self, cache_key: Dict[str, Any]):
+        """Tahmini arka plan thread'inde yeniden hesapla (anahtar başına bir kez)"""
+        refresh_id = json.dumps(cache_key, sort_keys=True)
+        with self._refresh_lock:
+            if refresh_id in self._refreshing:
+                return
+            self._refreshing.add(refresh_id)
+        
+        def refresh():
+            try:
+                self._coalesced_prediction(cache_key)
+            except Exception as e:
+                print(f"Tahmin yenileme hatası: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(refresh_id)
+        
+        threading.Thread(target=refresh, name="prediction-refresh", daemon=True).start()
+    
+    def _compute_prediction(self, cache_key: Dict[str, Any]) -> Dict[str, Any]:
+        """RARE hattını çalıştırıp tahmin sonucunu oluştur ve cache'le"""
+        exam_date = cache_key['exam_date']
+        question_count = cache_key['question_count']
+        difficulty_filter = cache_key['difficulty_filter']
+        topic_filter = cache_key['topic_filter']
+        
         # RARE modeli ile tahmin
         prediction_result = self.rare_model.predict_exam_questions(
             exam_type="LGS",
             subject="Din Kültürü", 
-            count=question_count
+            count=question_count,
+            for_date=cache_key['prediction_date']
         )
         
         # Filtreleme uygula
@@ -73,11 +142,182 @@ class PredictionService:
             "curriculum_coverage": self._analyze_curriculum_coverage(filtered_questions)
         }
         
-        # Cache'le
-        self.cache.cache_response("prediction_service", cache_key, final_result)
+        # Cache'le; son bilinen sonuç gün dönümünden sonra da (stale olarak) sunulabilsin
+        self.cache.cache_response("prediction_service", cache_key, final_result,
+                                  ttl=self._prediction_ttl(cache_key))
+        self.cache.cache_response(
+            "prediction_latest", self._latest_cache_key(cache_key), final_result,
+            ttl=settings.PREDICTION_STALE_TTL
+        )
         
         return final_result
     
+    def stream_next_exam_questions(self,
+                                   exam_date: str = None,
+                                   question_count: int = 20,
+                                   difficulty_filter: str = None,
+                                   topic_filter: str = None) -> Iterator[Dict[str, Any]]:
+        """Tahmin edilen soruları hazır oldukça akıt"""
+        cache_key = self._prediction_cache_key(exam_date, question_count, difficulty_filter, topic_filter)
+        
+        self._record_popularity(cache_key)
+        
+        # Bugünün (veya yenilenirken son bilinen) tahmini hazırsa doğrudan cache'den gönder
+        cached_result = self._get_cached_prediction(cache_key)
+        if cached_result:
+            questions = cached_result['predicted_questions']
+            for question in questions:
+                yield {"event": "question", "data": question}
+            yield {"event": "done", "data": {"total_predicted_questions": len(questions), "cached": True}}
+            return
+        
+        emitted = 0
+        for event in self.rare_model.stream_exam_questions(
+            exam_type="LGS",
+            subject="Din Kültürü",
+            count=question_count
+        ):
+            if event['event'] == 'question':
+                if not self._apply_filters([event['data']], difficulty_filter, topic_filter):
+                    continue
+                emitted += 1
+            elif event['event'] == 'done':
+                event['data']['total_predicted_questions'] = emitted
+            yield event
+    
+    def _prediction_cache_key(self, exam_date: str, question_count: int,
+                              difficulty_filter: str, topic_filter: str,
+                              for_date: str = None) -> Dict[str, Any]:
+        """Tahmin sonucunun cache anahtarını oluştur (for_date verilmezse bugün)"""
+        return {
+            "exam_date": exam_date,
+            "question_count": question_count, 
+            "difficulty_filter": difficulty_filter,
+            "topic_filter": topic_filter,
+            "prediction_date": for_date or datetime.now().strftime("%Y-%m-%d")
+        }
+    
+    def _prediction_ttl(self, cache_key: Dict[str, Any]) -> int:
+        """Sonucun cache süresi; ileri bir gün için (ön ısıtma) o günün başlangıcından CACHE_TTL sonrasına kadar"""
+        target_day = datetime.strptime(cache_key['prediction_date'], "%Y-%m-%d")
+        until_target = (target_day - datetime.now()).total_seconds()
+        return settings.CACHE_TTL + max(0, int(until_target))
+    
+    def _latest_cache_key(self, cache_key: Dict[str, Any]) -> Dict[str, Any]:
+        """Günden bağımsız 'son bilinen sonuç' anahtarı"""
+        return {key: value for key, value in cache_key.items() if key != "prediction_date"}
+    
+    def _popularity_key(self, date: str) -> str:
+        return f"prediction_popularity:{date}"
+    
+    def _popularity_commands(self, pipe, cache_key: Dict[str, Any]):
+        member = json.dumps(self._latest_cache_key(cache_key), sort_keys=True, ensure_ascii=False)
+        popularity_key = self._popularity_key(cache_key['prediction_date'])
+        pipe.zincrby(popularity_key, 1, member)
+        pipe.expire(popularity_key, 3 * 24 * 3600)
+        return pipe
+    
+    def _record_popularity(self, cache_key: Dict[str, Any]):
+        """Parametre kombinasyonunun günlük istek sayısını artır (ön ısıtma için)"""
+        if self.cache.breaker.is_open:
+            return
+        try:
+            self._popularity_commands(self.cache.redis_client.pipeline(transaction=False), cache_key).execute()
+        except Exception as e:
+            print(f"Popülerlik kaydı hatası: {e}")
+    
+    async def _record_popularity_async(self, cache_key: Dict[str, Any]):
+        if self.cache.breaker.is_open:
+            return
+        try:
+            await self._popularity_commands(self.cache.async_client.pipeline(transaction=False), cache_key).execute()
+        except Exception as e:
+            print(f"Popülerlik kaydı hatası: {e}")
+    
+    def popular_parameters(self, date: str = None, limit: int = None) -> List[Dict[str, Any]]:
+        """Verilen günün en çok istenen tahmin parametreleri"""
+        date = date or datetime.now().strftime("%Y-%m-%d")
+        limit = limit or settings.PREWARM_TOP_N
+        try:
+            members = self.cache.redis_client.zrevrange(self._popularity_key(date), 0, limit - 1)
+        except Exception as e:
+            print(f"Popülerlik okuma hatası: {e}")
+            return []
+        return [json.loads(member) for member in members]
+    
+    def prewarm_popular(self, for_date: str = None, limit: int = None) -> Dict[str, Any]:
+        """Popüler parametrelerin tahminlerini for_date (varsayılan: yarın) için önceden hesapla
+        
+        Gün dönümünden önce çalıştırılınca ertesi günün ilk kullanıcıları
+        tam RARE gecikmesini ödemez.
+        """
+        for_date = for_date or (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+        summary = {"date": for_date, "warmed": 0, "skipped": 0, "failed": 0}
+        
+        for params in self.popular_parameters(limit=limit):
+            cache_key = self._prediction_cache_key(
+                params.get('exam_date'), params.get('question_count', 20),
+                params.get('difficulty_filter'), params.get('topic_filter'),
+                for_date=for_date
+            )
+            if self.cache.get_cached_response("prediction_service", cache_key):
+                summary["skipped"] += 1
+                continue
+            try:
+                self._coalesced_prediction(cache_key)
+                summary["warmed"] += 1
+            except Exception as e:
+                print(f"Ön ısıtma hatası ({params}): {e}")
+                summary["failed"] += 1
+        
+        return summary
+    
+    async def predict_next_exam_questions_async(self,
+                                              exam_date: str = None,
+                                              question_count: int = 20,
+                                              difficulty_filter: str = None,
+                                              topic_filter: str = None) -> Dict[str, Any]:
+        """predict_next_exam_questions'ın event loop'u bloklamayan sürümü
+        
+        Taze cache isabeti redis.asyncio ile thread havuzuna geçmeden döner.
+        Iskalamada anahtar başına yalnızca bir istek senkron yolu thread'de
+        çalıştırır; aynı süreçteki diğer istekler onun görevini event loop
+        üzerinde bekler ve paylaşılan thread havuzunu doldurmaz.
+        """
+        cache_key = self._prediction_cache_key(exam_date, question_count, difficulty_filter, topic_filter)
+        cached_result = await self.cache.get_cached_response_async("prediction_service", cache_key)
+        if cached_result:
+            await self._record_popularity_async(cache_key)
+            return cached_result['response']
+        
+        flight_id = json.dumps(cache_key, sort_keys=True)
+        loop = asyncio.get_running_loop()
+        flight = self._async_flights.get(flight_id)
+        if flight is None or flight.get_loop() is not loop:
+            flight = loop.create_task(run_blocking(
+                self.predict_next_exam_questions,
+                exam_date=exam_date,
+                question_count=question_count,
+                difficulty_filter=difficulty_filter,
+                topic_filter=topic_filter
+            ))
+            self._async_flights[flight_id] = flight
+            flight.add_done_callback(lambda done: self._finish_async_flight(flight_id, done))
+        else:
+            await self._record_popularity_async(cache_key)
+        
+        # shield: bir bekleyenin bağlantısı koparsa ortak hesaplama iptal olmaz
+        result = await asyncio.shield(flight)
+        # Bekleyenler aynı nesneyi paylaşmasın
+        return copy.deepcopy(result)
+    
+    def _finish_async_flight(self, flight_id: str, flight: asyncio.Task):
+        if self._async_flights.get(flight_id) is flight:
+            del self._async_flights[flight_id]
+        if not flight.cancelled():
+            # Tüm bekleyenler ayrıldıysa hata "alınmadı" uyarısı vermesin
+            flight.exception()
+    
     def _apply_filters(self, questions: List[Dict[str, Any]], 
                       difficulty_filter: str = None,
                       topic_filter: str = None) -> List[Dict[str, Any]]:
@@ -168,9 +408,9 @@ class PredictionService:
         deep_analysis = self.rare_model.deep_reasoning(topic, depth)
         
         # Konuya özel sorular üret
-        context = self.rare_model.rag_system.get_context_for_query(f"{topic} soruları", topic)
+        context_bundle = self.rare_model.rag_system.get_context_bundle(f"{topic} soruları", topic)
         topic_questions = self.rare_model.gemini_service.generate_questions_with_reasoning(
-            context, topic, 10
+            context_bundle['context'], topic, 10, source_ids=context_bundle['source_ids']
         )
         
         return {
@@ -178,4 +418,8 @@ class PredictionService:
             "deep_analysis": deep_analysis,
             "generated_questions": topic_questions,
             "prediction_timestamp": datetime.now().isoformat()
-        }
\ No newline at end of file
+        }
+    
+    async def get_topic_specific_prediction_async(self, topic: str, depth: int = 2) -> Dict[str, Any]:
+        """get_topic_specific_prediction'ın event loop'u bloklamayan sürümü"""
+        return await run_blocking(self.get_topic_specific_prediction, topic, depth)
\ No newline at end of file
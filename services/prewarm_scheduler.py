@@ -0,0 +1,59 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from models.cag_cache import CAGCache
+from services.prediction_service import PredictionService
+from config.settings import settings
+
+class PrewarmScheduler:
+    """Popüler tahminleri her gün gün dönümünden önce ertesi gün için hesaplatan zamanlayıcı
+    
+    PREWARM_TIME (SS:DD, yerel saat) geldiğinde bir kez çalışır. Birden fazla
+    worker'da başlatılsa da Redis kilidi sayesinde her gün tek worker ısıtır.
+    """
+    
+    def __init__(self, prediction_service: Callable[[], PredictionService], cache: CAGCache):
+        # Servis ilk çalışmada çözülür; zamanlayıcı ısınma bitmeden başlatılabilir
+        self._prediction_service = prediction_service
+        self.cache = cache
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_run = None
+    
+    def start(self):
+        """Zamanlayıcı thread'ini başlat (bir kez)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="prediction-prewarm", daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _seconds_until_next_run(self, now: datetime) -> float:
+        hour, minute = (int(part) for part in settings.PREWARM_TIME.split(":"))
+        next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+    
+    def _run(self):
+        while not self._stop.wait(self._seconds_until_next_run(datetime.now())):
+            self.run_once()
+    
+    def run_once(self) -> Optional[dict]:
+        """Yarın için ön ısıtmayı çalıştır; başka worker bugün çalıştırdıysa atla"""
+        for_date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+        try:
+            acquired = self.cache.redis_client.set(f"prewarm_lock:{for_date}", "1", nx=True, ex=6 * 3600)
+        except Exception as e:
+            print(f"Ön ısıtma kilidi alınamadı: {e}")
+            acquired = True
+        if not acquired:
+            return None
+        
+        try:
+            self.last_run = self._prediction_service().prewarm_popular(for_date=for_date)
+            print(f"Tahmin ön ısıtması tamamlandı: {self.last_run}")
+        except Exception as e:
+            print(f"Tahmin ön ısıtma hatası: {e}")
+        return self.last_run
@@ -0,0 +1,79 @@
+import hashlib
+from typing import List, Dict, Any
+from utils.text_processor import TextProcessor
+from config.settings import settings
+
+class DocumentChunker:
+    """Dokümanları en fazla max_words kelimelik, örtüşmeli parçalara böl
+    
+    Metinde noktalama varsa cümleler parçalara doldurulur ve bir sonraki parça
+    öncekinin son cümlelerini (en fazla overlap_words kelime) tekrar eder; sınırı
+    aşan cümleler örtüşmeli kelime pencerelerine bölünür. Müfredat dokümanları
+    clean_text'ten noktalamasız geldiğinden bütün doküman tek "cümle" olur ve
+    parçalar pratikte sabit boyutlu, overlap_words kadar örtüşen kelime
+    pencereleridir.
+    """
+    
+    def __init__(self, text_processor: TextProcessor, max_words: int = None, overlap_words: int = None):
+        self.text_processor = text_processor
+        self.max_words = max_words or settings.CHUNK_MAX_WORDS
+        self.overlap_words = settings.CHUNK_OVERLAP_WORDS if overlap_words is None else overlap_words
+    
+    @staticmethod
+    def parent_id(doc: Dict[str, Any]) -> str:
+        """Üst dokümanın kimliği (RAGSystem'in içerik tabanlı kimliğiyle aynı)"""
+        return hashlib.md5(doc['content'].encode('utf-8')).hexdigest()
+    
+    def _windows(self, words: List[str]) -> List[List[str]]:
+        step = max(self.max_words - self.overlap_words, 1)
+        return [words[start:start + self.max_words]
+                for start in range(0, max(len(words) - self.overlap_words, 1), step)]
+    
+    def split(self, text: str) -> List[str]:
+        """Metni parça metinlerine böl"""
+        # Her parça, cümlelerin kelime listelerinden oluşan bir liste
+        chunks = []
+        current, current_words = [], 0
+        for sentence in self.text_processor.split_into_sentences(text):
+            words = sentence.split()
+            if not words:
+                continue
+            
+            if len(words) > self.max_words:
+                if current:
+                    chunks.append(current)
+                chunks.extend([window] for window in self._windows(words))
+                current, current_words = [], 0
+                continue
+            
+            if current and current_words + len(words) > self.max_words:
+                chunks.append(current)
+                # Örtüşme: önceki parçanın sığan son cümleleri yeni parçanın başına
+                tail, tail_words = [], 0
+                for previous in reversed(current):
+                    if tail_words + len(previous) > self.overlap_words:
+                        break
+                    tail.insert(0, previous)
+                    tail_words += len(previous)
+                current, current_words = tail, tail_words
+            
+            current.append(words)
+            current_words += len(words)
+        
+        if current:
+            chunks.append(current)
+        
+        return [' '.join(' '.join(words) for words in chunk) for chunk in chunks]
+    
+    def chunk_documents(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Her dokümanı parçalara böl; parçalar üst dokümanın alanlarını ve kimliğini taşır"""
+        chunked = []
+        for doc in documents:
+            parent_id = self.parent_id(doc)
+            for index, text in enumerate(self.split(doc['content'])):
+                chunk = doc.copy()
+                chunk['content'] = text
+                chunk['parent_id'] = parent_id
+                chunk['chunk_index'] = index
+                chunked.append(chunk)
+        return chunked
@@ -0,0 +1,100 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Iterable, List, Optional
+from config.settings import settings
+
+_POLL_INTERVAL = 0.05
+
+_executor = None
+_probe_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor() -> ThreadPoolExecutor:
+    """Bloklayan işler için paylaşılan thread havuzunu döndür"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.WORKER_THREADS,
+                    thread_name_prefix="blocking-worker"
+                )
+    return _executor
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Senkron fonksiyonu event loop'u bloklamadan thread havuzunda çalıştır"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+def _get_probe_executor() -> ThreadPoolExecutor:
+    global _probe_executor
+    if _probe_executor is None:
+        with _executor_lock:
+            if _probe_executor is None:
+                _probe_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="probe-worker")
+    return _probe_executor
+
+async def run_probe(func: Callable[..., Any], *args, timeout: float = None) -> Any:
+    """Sağlık kontrolü çağrısını ayrı küçük havuzda, süre sınırıyla çalıştır
+    
+    Paylaşılan havuz uzun LLM işleriyle dolu olsa da sağlık kontrolleri
+    beklemez; süre aşılırsa asyncio.TimeoutError fırlatılır.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_get_probe_executor(), functools.partial(func, *args))
+    return await asyncio.wait_for(future, timeout or settings.HEALTH_PROBE_TIMEOUT)
+
+def map_with_timeout(func: Callable[[Any], Any], items: Iterable[Any],
+                     max_concurrency: int, timeout: float) -> List[Optional[Any]]:
+    """Öğeleri sınırlı eşzamanlılıkla paralel işle.
+    
+    Sonuçlar girdi sırasıyla döner. Süresi (öğe başladıktan sonra) aşan ya da
+    hata veren öğelerin yerinde None bulunur; diğer öğeler beklenmeye devam eder.
+    Süresi aşan görev durdurulamadığından bitene kadar thread'ini tutar; böylece
+    eşzamanlı çağrı sayısı hiçbir zaman max_concurrency'yi geçmez, sıradaki
+    öğeler o thread boşalınca başlar.
+    """
+    items = list(items)
+    if not items:
+        return []
+    
+    results = [None] * len(items)
+    lock = threading.Lock()
+    started = {}
+    
+    def run(index: int, item: Any) -> Any:
+        with lock:
+            started[index] = time.monotonic()
+        return func(item)
+    
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(max_concurrency, len(items))),
+        thread_name_prefix="fanout-worker"
+    )
+    futures = {executor.submit(run, i, item): i for i, item in enumerate(items)}
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    print(f"Paralel görev hatası ({items[index]}): {e}")
+            
+            now = time.monotonic()
+            for future in list(pending):
+                index = futures[future]
+                with lock:
+                    start = started.get(index)
+                if start is not None and now - start > timeout:
+                    print(f"Paralel görev zaman aşımı, atlanıyor: {items[index]}")
+                    pending.discard(future)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    return results
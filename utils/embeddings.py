@@ -1,37 +1,98 @@
-from sentence_transformers import SentenceTransformer
+import threading
 import numpy as np
 from typing import List, Union
 from config.settings import settings
 
 class EmbeddingGenerator:
     def __init__(self):
-        self.model = SentenceTransformer(settings.EMBEDDING_MODEL)
+        # Model ilk kullanımda (veya warm_up ile) yüklenir
+        self._model = None
+        self._model_lock = threading.Lock()
     
-    def encode(self, texts: Union[str, List[str]]) -> np.ndarray:
-        """Metinleri embedding'lere dönüştür"""
+    @property
+    def model(self):
+        """SentenceTransformer modelini gerektiğinde yükle"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    model = SentenceTransformer(settings.EMBEDDING_MODEL)
+                    # Snapshot ve cache'teki vektörler ayarlardaki boyuta göre doğrulanır
+                    dimension = model.get_sentence_embedding_dimension()
+                    if dimension != settings.EMBEDDING_DIMENSION:
+                        raise ValueError(
+                            f"{settings.EMBEDDING_MODEL} {dimension} boyutlu embedding üretiyor, "
+                            f"EMBEDDING_DIMENSION={settings.EMBEDDING_DIMENSION}"
+                        )
+                    self._model = model
+        return self._model
+    
+    @property
+    def is_loaded(self) -> bool:
+        """Model belleğe yüklendi mi"""
+        return self._model is not None
+    
+    def warm_up(self):
+        """Modeli yükle ve ilk çağrının gecikmesini önceden öde"""
+        self.encode("warm up")
+    
+    def encode(self, texts: Union[str, List[str]], batch_size: int = None, normalize: bool = False) -> np.ndarray:
+        """Metinleri embedding'lere dönüştür (normalize=True ile birim uzunlukta)"""
         if isinstance(texts, str):
             texts = [texts]
-        return self.model.encode(texts)
+        if batch_size is None:
+            batch_size = settings.EMBEDDING_BATCH_SIZE
+        return self.model.encode(texts, batch_size=batch_size, normalize_embeddings=normalize)
+    
+    def encode_candidates(self, candidates: List[str]) -> np.ndarray:
+        """Aday metinleri tekrar kullanılabilir, normalize edilmiş float32 matrise çevir"""
+        return np.asarray(self.encode(candidates, normalize=True), dtype=np.float32)
     
     def compute_similarity(self, text1: str, text2: str) -> float:
         """İki metin arasındaki benzerliği hesapla"""
-        embeddings = self.encode([text1, text2])
-        similarity = np.dot(embeddings[0], embeddings[1]) / (
-            np.linalg.norm(embeddings[0]) * np.linalg.norm(embeddings[1])
-        )
-        return float(similarity)
-    
-    def find_most_similar(self, query: str, candidates: List[str], top_k: int = 5) -> List[tuple]:
-        """En benzer metinleri bul"""
-        query_embedding = self.encode(query)
-        candidate_embeddings = self.encode(candidates)
+        embeddings = self.encode([text1, text2], normalize=True)
+        return float(np.dot(embeddings[0], embeddings[1]))
+    
+    def _top_k_indices(self, scores: np.ndarray, top_k: int) -> np.ndarray:
+        """Skorların en büyük top_k tanesinin indeksleri (azalan sırada)
+        
+        Tam sıralama yerine argpartition ile O(n) seçim yapılır, yalnızca
+        seçilen k eleman sıralanır. 2 boyutlu skorlarda her satır ayrı işlenir.
+        """
+        k = min(top_k, scores.shape[-1])
+        if k <= 0:
+            return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+        
+        if k < scores.shape[-1]:
+            indices = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+        else:
+            indices = np.broadcast_to(np.arange(k), scores.shape[:-1] + (k,))
+        selected = np.take_along_axis(scores, indices, axis=-1)
+        order = np.argsort(-selected, axis=-1, kind='stable')
+        return np.take_along_axis(indices, order, axis=-1)
+    
+    def find_most_similar(self, query: str, candidates: List[str], top_k: int = 5,
+                          candidate_embeddings: np.ndarray = None) -> List[tuple]:
+        """En benzer metinleri bul
+        
+        candidate_embeddings verilirse (encode_candidates çıktısı) adaylar
+        yeniden encode edilmez.
+        """
+        return self.find_most_similar_batch([query], candidates, top_k, candidate_embeddings)[0]
+    
+    def find_most_similar_batch(self, queries: List[str], candidates: List[str], top_k: int = 5,
+                                candidate_embeddings: np.ndarray = None) -> List[List[tuple]]:
+        """Birden fazla sorgu için en benzer metinleri tek matris çarpımıyla bul"""
+        if not queries or not candidates:
+            return [[] for _ in queries]
+        if candidate_embeddings is None:
+            candidate_embeddings = self.encode_candidates(candidates)
         
-        similarities = []
-        for i, candidate_embedding in enumerate(candidate_embeddings):
-            similarity = np.dot(query_embedding, candidate_embedding) / (
-                np.linalg.norm(query_embedding) * np.linalg.norm(candidate_embedding)
-            )
-            similarities.append((i, candidates[i], float(similarity)))
+        query_embeddings = np.asarray(self.encode(queries, normalize=True), dtype=np.float32)
+        scores = query_embeddings @ candidate_embeddings.T
+        top_indices = self._top_k_indices(scores, top_k)
         
-        similarities.sort(key=lambda x: x[2], reverse=True)
-        return similarities[:top_k]
+        return [
+            [(int(i), candidates[i], float(row_scores[i])) for i in row_indices]
+            for row_scores, row_indices in zip(scores, top_indices)
+        ]
@@ -0,0 +1,85 @@
+import json
+import re
+from typing import Any, Dict, List
+
+class JSONArrayStreamParser:
+    """Parça parça gelen JSON metninde bir dizinin tamamlanan nesnelerini çıkarır.
+    
+    LLM çıktısı markdown bloğu veya açıklama metni içerse bile yalnızca
+    `"<array_key>": [ ... ]` dizisinin elemanlarına bakılır.
+    """
+    
+    def __init__(self, array_key: str = "questions"):
+        self._key_pattern = re.compile(r'"' + re.escape(array_key) + r'"\s*:\s*\[')
+        self._text = ""
+        self._pos = 0
+        self._in_array = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = None
+    
+    @property
+    def finished(self) -> bool:
+        """Dizi kapandı mı"""
+        return self._finished
+    
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Yeni parçayı ekle ve bu parçayla tamamlanan nesneleri döndür"""
+        if self._finished or not chunk:
+            return []
+        self._text += chunk
+        
+        if not self._in_array:
+            match = self._key_pattern.search(self._text, self._pos)
+            if not match:
+                # Anahtar parçalar arasında bölünmüş olabilir, sonu yeniden taranır
+                self._pos = max(self._pos, len(self._text) - 64)
+                return []
+            self._in_array = True
+            self._pos = match.end()
+        
+        return self._scan()
+    
+    def _scan(self) -> List[Dict[str, Any]]:
+        """Dizi içini kaldığı yerden tara"""
+        completed = []
+        text = self._text
+        i = self._pos
+        while i < len(text):
+            char = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                if self._depth == 0 and char == '{':
+                    self._object_start = i
+                self._depth += 1
+            elif char in '}]':
+                if self._depth == 0:
+                    # Dizinin kendisi kapandı
+                    self._finished = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    try:
+                        completed.append(json.loads(text[self._object_start:i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self._object_start = None
+            i += 1
+        
+        self._pos = i
+        # Tamamlanan nesnelerin metnine artık ihtiyaç yok
+        if self._object_start is None:
+            self._text = self._text[self._pos:]
+            self._pos = 0
+        return completed
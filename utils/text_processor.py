@@ -1,13 +1,40 @@
 import re
+import threading
 import nltk
-from typing import List, Dict, Any
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple
 from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize, sent_tokenize
+from nltk.tokenize import sent_tokenize
+from config.settings import settings
+
+# Desenler modül yüklenirken bir kez derlenir
+_HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+_WORD_PATTERN = re.compile(r'\w+')
+_TURKISH_LOWER = str.maketrans({"İ": "i", "I": "ı"})
+
+def turkish_lower(text: str) -> str:
+    """Türkçe uyumlu küçük harfe çevirme (İ -> i, I -> ı)
+    
+    str.lower() 'I' harfini 'i', 'İ' harfini 'i̇' (noktalı) yapar; önce Türkçe
+    büyük harfler çevrilir, geri kalanı lower() ile yapılır.
+    """
+    return text.translate(_TURKISH_LOWER).lower()
 
 class TextProcessor:
+    # NLTK veri kontrolü ve stopword listesi süreç başına bir kez yapılır
+    _shared_stop_words = None
+    _init_lock = threading.Lock()
+    
     def __init__(self):
-        self._download_nltk_data()
-        self.stop_words = set(stopwords.words('turkish'))
+        if TextProcessor._shared_stop_words is None:
+            with TextProcessor._init_lock:
+                if TextProcessor._shared_stop_words is None:
+                    self._download_nltk_data()
+                    TextProcessor._shared_stop_words = frozenset(
+                        turkish_lower(word) for word in stopwords.words('turkish')
+                    )
+        self.stop_words = TextProcessor._shared_stop_words
     
     def _download_nltk_data(self):
         """NLTK verilerini indir"""
@@ -19,19 +46,17 @@ class TextProcessor:
             nltk.download('stopwords')
     
     def clean_text(self, text: str) -> str:
-        """Metni temizle"""
-        # HTML taglarını kaldır
-        text = re.sub(r'<[^>]+>', '', text)
-        # Özel karakterleri kaldır
-        text = re.sub(r'[^\w\s]', ' ', text)
-        # Çoklu boşlukları tek boşluk yap
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
+        """Metni temizle (HTML taglarını ve noktalamayı kaldır, boşlukları tekleştir)"""
+        # Noktalamayı boşluğa çevirip boşlukları sıkıştırmak, kelimeleri tek boşlukla birleştirmekle aynıdır
+        return ' '.join(_WORD_PATTERN.findall(_HTML_TAG_PATTERN.sub('', text)))
     
     def tokenize(self, text: str) -> List[str]:
-        """Metni tokenize et"""
-        tokens = word_tokenize(text.lower(), language='turkish')
-        return [token for token in tokens if token not in self.stop_words and len(token) > 2]
+        """Metni tokenize et (tek geçişli regex, Türkçe küçük harf)"""
+        stop_words = self.stop_words
+        return [
+            token for token in _WORD_PATTERN.findall(turkish_lower(text))
+            if len(token) > 2 and token not in stop_words
+        ]
     
     def split_into_sentences(self, text: str) -> List[str]:
         """Metni cümlelere ayır"""
@@ -39,10 +64,33 @@ class TextProcessor:
     
     def extract_keywords(self, text: str, top_k: int = 10) -> List[str]:
         """Anahtar kelimeleri çıkar"""
-        tokens = self.tokenize(text)
-        word_freq = {}
-        for token in tokens:
-            word_freq[token] = word_freq.get(token, 0) + 1
+        return [word for word, _ in Counter(self.tokenize(text)).most_common(top_k)]
+    
+    def clean_and_extract(self, text: str, top_k: int = 10) -> Tuple[str, List[str]]:
+        """Metni temizle ve temiz metnin anahtar kelimelerini çıkar"""
+        cleaned_text = self.clean_text(text)
+        return cleaned_text, self.extract_keywords(cleaned_text, top_k)
+    
+    def clean_and_extract_many(self, texts: List[str], top_k: int = 10,
+                               workers: int = None) -> List[Tuple[str, List[str]]]:
+        """clean_and_extract'in toplu sürümü; sonuçlar girdi sırasındadır
+        
+        workers > 1 ve metin sayısı TEXT_PROCESS_MIN_BATCH'ten büyükse süreç
+        havuzu kullanılır (büyük derlemler için); aksi halde aynı süreçte çalışır.
+        """
+        workers = settings.TEXT_PROCESS_WORKERS if workers is None else workers
+        if workers <= 1 or len(texts) < settings.TEXT_PROCESS_MIN_BATCH:
+            return [self.clean_and_extract(text, top_k) for text in texts]
         
-        sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-        return [word for word, freq in sorted_words[:top_k]]
\ No newline at end of file
+        chunksize = max(1, len(texts) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_clean_and_extract_worker, texts, [top_k] * len(texts), chunksize=chunksize))
+
+_worker_processor = None
+
+def _clean_and_extract_worker(text: str, top_k: int) -> Tuple[str, List[str]]:
+    """Süreç havuzu işçisi; her işçi süreci kendi TextProcessor'ını bir kez kurar"""
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = TextProcessor()
+    return _worker_processor.clean_and_extract(text, top_k)